@@ -0,0 +1,367 @@
+"""Local stand-ins for the arXiv and Semantic Scholar APIs, serving a synthetic corpus.
+
+    python benchmarks/mock_servers.py [--papers 10000] [--latency 0.01] [--error-rate 0.01] [--rate-429 0.01]
+
+Point LitrevTools at a running server with `arxiv_api_url=server.url + '/api/query'` and
+`s2_api_url=server.url`. Implemented endpoints:
+
+    GET  /api/query                         arXiv Atom API: id_list, title phrases (OR-combined
+                                            or not) and lastUpdatedDate windows, paginated
+    GET  /bibtex/<arxiv id>                 arXiv bibtex
+    GET  /pdf/<arxiv id>                    a small fake PDF
+    GET  /graph/v1/paper/search             Semantic Scholar search (exact title match)
+    POST /graph/v1/paper/batch              Semantic Scholar batch
+    GET  /graph/v1/paper/<id>/citations     Semantic Scholar citations, paginated
+    GET  /graph/v1/paper/<id>/references    Semantic Scholar references, paginated
+
+Every request waits `latency` seconds, then fails with a 429 (with a Retry-After header) with
+probability `rate_429`, or with a 500 with probability `error_rate`.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape, quoteattr
+
+
+START_DATE = datetime(2024, 1, 1)
+CATEGORIES = ['cs.LG', 'stat.ML', 'stat.ME', 'math.ST', 'econ.EM', 'stat.AP', 'cs.CL', 'cs.CV']
+TOPICS = [
+    'causal inference', 'score matching', 'diffusion models', 'graph neural networks', 'bandits',
+    'conformal prediction', 'variational inference', 'reinforcement learning', 'optimal transport',
+    'kernel methods',
+]
+WORDS = [
+    'adaptive', 'robust', 'scalable', 'efficient', 'sparse', 'deep', 'bayesian', 'stochastic', 'neural',
+    'latent', 'contrastive', 'hierarchical', 'federated', 'online', 'private', 'fair', 'generative',
+    'implicit', 'spectral', 'structured', 'provable', 'universal', 'distributed', 'multimodal', 'temporal',
+    'invariant', 'equivariant', 'nonparametric', 'regularized', 'interpretable', 'calibrated', 'continual',
+    'estimation', 'learning', 'inference', 'sampling', 'representations', 'networks', 'objectives',
+    'bounds', 'guarantees', 'gradients', 'priors', 'embeddings', 'policies', 'kernels', 'experts',
+]
+NAMES = ['Ada', 'Alan', 'Grace', 'John', 'Emmy', 'Kurt', 'Sofia', 'Leonhard', 'Marie', 'Carl', 'Hedy', 'David']
+SURNAMES = ['Lovelace', 'Turing', 'Hopper', 'Neumann', 'Noether', 'Godel', 'Kovalevskaya', 'Euler', 'Curie',
+            'Gauss', 'Lamarr', 'Hilbert', 'Shannon', 'Laplace', 'Bernoulli', 'Fisher', 'Pearl', 'Vapnik']
+
+FAKE_PDF = b'%PDF-1.4\n' + b'0' * 4096 + b'\n%%EOF\n'
+
+
+def normalize(title):
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', title.lower()).split())
+
+
+def synthetic_corpus(n, seed=0):
+    """n papers with distinct titles, arXiv and Semantic Scholar metadata, and citation edges."""
+    rng = random.Random(seed)
+    papers = []
+    seen = set()
+    for i in range(n):
+        while True:
+            words = rng.sample(WORDS, 5)
+            title = f"{' '.join(words[:3]).capitalize()} {words[3]} for {rng.choice(TOPICS)} with {words[4]} priors"
+            if normalize(title) not in seen:
+                seen.add(normalize(title))
+                break
+        updated = START_DATE + timedelta(minutes=10 * i)
+        authors = [f'{rng.choice(NAMES)} {rng.choice(SURNAMES)}' for _ in range(rng.randint(1, 4))]
+        categories = rng.sample(CATEGORIES, rng.randint(1, 3))
+        papers.append({
+            'paperId': f'{i:040x}',
+            'arxivId': f'{24 + i // 90000:02d}{1 + (i // 7500) % 12:02d}.{i % 90000:05d}',
+            'title': title,
+            'abstract': f'We study {title.lower()}. ' + ' '.join(rng.choices(WORDS, k=60)) + '.',
+            'authors': authors,
+            'categories': categories,
+            'updated': updated,
+            'year': updated.year,
+            'publicationDate': updated.strftime('%Y-%m-%d'),
+            'citationCount': int(rng.paretovariate(1.2)) - 1,
+            'references': [],
+            'citations': [],
+        })
+    for i, paper in enumerate(papers):
+        for j in rng.sample(range(n), min(n, rng.randint(0, 15))):
+            if j != i:
+                paper['references'].append(j)
+                papers[j]['citations'].append(i)
+    return papers
+
+
+class MockServer():
+    """Threaded HTTP server for a corpus, run in a background thread.
+
+    `counts` holds the number of requests received per endpoint, failed ones included, and
+    `connections` the number of TCP connections accepted (both reset by `reset_counts`).
+    """
+
+    def __init__(self, papers, latency=0., error_rate=0., rate_429=0., retry_after=0, seed=0, host='127.0.0.1', port=0):
+        self.papers = papers
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.counts = {}
+        self.connections = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.by_title = {}
+        for i, paper in enumerate(papers):
+            self.by_title.setdefault(normalize(paper['title']), i)
+        self.by_arxiv_id = {paper['arxivId']: i for i, paper in enumerate(papers)}
+        self.by_paper_id = {paper['paperId']: i for i, paper in enumerate(papers)}
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_counts(self):
+        with self._lock:
+            counts, self.counts = self.counts, {}
+            self.connections = 0
+        return counts
+
+    def _count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def _count(self, endpoint):
+        with self._lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+            return self._rng.random()
+
+    # arXiv
+
+    def arxiv_query(self, params):
+        start = int(params.get('start', ['0'])[0])
+        max_results = int(params.get('max_results', ['10'])[0])
+        if 'id_list' in params and params['id_list'][0] != '':
+            indices = [self.by_arxiv_id.get(re.sub(r'v[0-9]+$', '', arxiv_id)) for arxiv_id in params['id_list'][0].split(',')]
+            indices = [i for i in indices if i is not None]
+        else:
+            indices = self._arxiv_search(params.get('search_query', [''])[0])
+        page = indices[start:start + max_results]
+        entries = ''.join(self._atom_entry(self.papers[i]) for i in page)
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/" '
+            'xmlns:arxiv="http://arxiv.org/schemas/atom">'
+            '<title>arXiv Query</title><id>http://arxiv.org/api/mock</id>'
+            f"<updated>{time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}</updated>"
+            f'<opensearch:totalResults>{len(indices)}</opensearch:totalResults>'
+            f'<opensearch:startIndex>{start}</opensearch:startIndex>'
+            f'<opensearch:itemsPerPage>{max_results}</opensearch:itemsPerPage>'
+            f'{entries}</feed>'
+        ).encode('utf-8')
+
+    def _arxiv_search(self, query):
+        window = re.search(r'lastUpdatedDate:\[([0-9]{12})\s+TO\s+([0-9]{12})\]', query)
+        if window is not None:
+            start, end = (datetime.strptime(bound, '%Y%m%d%H%M') for bound in window.groups())
+            categories = set(re.findall(r'cat:([A-Za-z\-]+\.[A-Za-z]+)', query))
+            # The corpus is sorted by last update already
+            return [i for i, paper in enumerate(self.papers) if start <= paper['updated'] <= end + timedelta(seconds=59)
+                    and (len(categories) == 0 or not categories.isdisjoint(paper['categories']))]
+        phrases = re.findall(r'"([^"]*)"', query)
+        indices = [self.by_title.get(normalize(phrase)) for phrase in phrases]
+        return list(dict.fromkeys(i for i in indices if i is not None))
+
+    def _atom_entry(self, paper):
+        base = self.url
+        arxiv_id = paper['arxivId']
+        timestamp = f"{paper['updated']:%Y-%m-%dT%H:%M:%SZ}"
+        authors = ''.join(f'<author><name>{escape(author)}</name></author>' for author in paper['authors'])
+        categories = ''.join(f'<category term="{category}" scheme="http://arxiv.org/schemas/atom"/>' for category in paper['categories'])
+        return (
+            f'<entry><id>http://arxiv.org/abs/{arxiv_id}v1</id><updated>{timestamp}</updated><published>{timestamp}</published>'
+            f"<title>{escape(paper['title'])}</title><summary>{escape(paper['abstract'])}</summary>{authors}"
+            f'<link href="{base}/abs/{arxiv_id}v1" rel="alternate" type="text/html"/>'
+            f'<link title="pdf" href="{base}/pdf/{arxiv_id}v1" rel="related" type="application/pdf"/>'
+            f"<arxiv:primary_category term={quoteattr(paper['categories'][0])} scheme=\"http://arxiv.org/schemas/atom\"/>"
+            f'{categories}</entry>'
+        )
+
+    def arxiv_bibtex(self, arxiv_id):
+        i = self.by_arxiv_id.get(re.sub(r'v[0-9]+$', '', arxiv_id))
+        if i is None:
+            return None
+        return self._bibtex(self.papers[i], 'misc', extra=(
+            f"      eprint={{{self.papers[i]['arxivId']}}},\n"
+            f"      archivePrefix={{arXiv}},\n"
+            f"      primaryClass={{{self.papers[i]['categories'][0]}}},\n"
+            f"      url={{https://arxiv.org/abs/{self.papers[i]['arxivId']}}}, \n"
+        )).encode('utf-8')
+
+    def _bibtex(self, paper, entry_type, extra=''):
+        key = paper['authors'][0].split(' ')[-1].lower() + str(paper['year']) + paper['title'].split(' ')[0].lower()
+        return (
+            f"@{entry_type}{{{key},\n"
+            f"      title={{{paper['title']}}}, \n"
+            f"      author={{{' and '.join(paper['authors'])}}},\n"
+            f"      year={{{paper['year']}}},\n"
+            f"{extra}"
+            f"}}"
+        )
+
+    # Semantic Scholar
+
+    def s2_paper(self, paper, fields):
+        result = {'paperId': paper['paperId']}
+        for field in fields:
+            if field == 'citationStyles':
+                result[field] = {'bibtex': self._bibtex(paper, 'Article')}
+            elif field == 'openAccessPdf':
+                result[field] = {'url': f"{self.url}/pdf/{paper['arxivId']}", 'status': 'GREEN'}
+            elif field == 'authors':
+                result[field] = [{'authorId': None, 'name': author} for author in paper['authors']]
+            elif field == 'externalIds':
+                result[field] = {'ArXiv': paper['arxivId']}
+            elif field in ('title', 'abstract', 'year', 'citationCount', 'publicationDate'):
+                result[field] = paper[field]
+        return result
+
+    def s2_search(self, params):
+        fields = params.get('fields', ['title'])[0].split(',')
+        i = self.by_title.get(normalize(params.get('query', [''])[0]))
+        data = [] if i is None else [self.s2_paper(self.papers[i], fields)]
+        return {'total': len(data), 'offset': 0, 'data': data}
+
+    def s2_batch(self, params, body):
+        fields = params.get('fields', ['title'])[0].split(',')
+        indices = [self.by_paper_id.get(paper_id) for paper_id in body['ids']]
+        return [None if i is None else self.s2_paper(self.papers[i], fields) for i in indices]
+
+    def s2_neighbours(self, paper_id, direction, params):
+        i = self.by_paper_id.get(paper_id)
+        if i is None:
+            return None
+        fields = params.get('fields', ['title'])[0].split(',')
+        offset = int(params.get('offset', ['0'])[0])
+        limit = int(params.get('limit', ['100'])[0])
+        key = 'citingPaper' if direction == 'citations' else 'citedPaper'
+        neighbours = self.papers[i][direction]
+        data = [{key: self.s2_paper(self.papers[j], fields)} for j in neighbours[offset:offset + limit]]
+        result = {'offset': offset, 'data': data}
+        if offset + limit < len(neighbours):
+            result['next'] = offset + limit
+        return result
+
+
+def _make_handler(server):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True  # headers and body are separate writes: avoids delayed ACKs on kept-alive connections
+
+        def log_message(self, format, *args):
+            pass
+
+        def setup(self):
+            super().setup()
+            server._count_connection()
+
+        def _send(self, status, body=b'', content_type='application/json', headers=None):
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(body)
+
+        def _endpoint(self, path):
+            if re.fullmatch(r'/graph/v1/paper/[^/]+/(citations|references)', path) is not None:
+                return 'semanticscholar ' + path.rsplit('/', 1)[-1]
+            for prefix, endpoint in [('/api/query', 'arxiv query'), ('/bibtex/', 'arxiv bibtex'), ('/pdf/', 'pdf'),
+                                     ('/graph/v1/paper/search', 'semanticscholar search'),
+                                     ('/graph/v1/paper/batch', 'semanticscholar batch')]:
+                if path.startswith(prefix):
+                    return endpoint
+            return 'other'
+
+        def _handle(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            endpoint = self._endpoint(url.path)
+            draw = server._count(endpoint)
+            if server.latency > 0:
+                time.sleep(server.latency)
+            if draw < server.rate_429:
+                return self._send(429, {'message': 'Too Many Requests'}, headers={'Retry-After': str(server.retry_after)})
+            if draw < server.rate_429 + server.error_rate:
+                return self._send(500, {'message': 'Internal Server Error'})
+
+            if endpoint == 'arxiv query':
+                return self._send(200, server.arxiv_query(params), content_type='application/atom+xml; charset=utf-8')
+            if endpoint == 'arxiv bibtex':
+                bibtex = server.arxiv_bibtex(url.path.rsplit('/', 1)[-1])
+                return self._send(200, bibtex, content_type='text/plain') if bibtex is not None else self._send(404, {'error': 'Not found'})
+            if endpoint == 'pdf':
+                return self._send(200, FAKE_PDF, content_type='application/pdf')
+            if endpoint == 'semanticscholar search':
+                return self._send(200, server.s2_search(params))
+            if endpoint == 'semanticscholar batch':
+                length = int(self.headers.get('Content-Length', 0))
+                return self._send(200, server.s2_batch(params, json.loads(self.rfile.read(length) or b'{}')))
+            if endpoint.startswith('semanticscholar '):
+                paper_id, direction = url.path.split('/')[-2:]
+                result = server.s2_neighbours(paper_id, direction, params)
+                return self._send(200, result) if result is not None else self._send(404, {'error': 'Paper not found'})
+            return self._send(404, {'error': 'Not found'})
+
+        do_GET = _handle
+        do_POST = _handle
+        do_HEAD = _handle
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--papers', type=int, default=10000)
+    parser.add_argument('--latency', type=float, default=0.)
+    parser.add_argument('--error-rate', type=float, default=0.)
+    parser.add_argument('--rate-429', type=float, default=0.)
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    server = MockServer(synthetic_corpus(args.papers), latency=args.latency, error_rate=args.error_rate,
+                        rate_429=args.rate_429, port=args.port)
+    print(f'Serving {args.papers} papers on {server.url}')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.counts, indent=1))
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
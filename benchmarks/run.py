@@ -0,0 +1,141 @@
+"""Throughput benchmark of the pipeline stages against local mock arXiv / Semantic Scholar servers.
+
+    python benchmarks/run.py [--sizes 100 1000 10000] [--stages filter bulldozer] [--workers 8]
+                             [--latency 0.005] [--error-rate 0.01] [--rate-429 0.01] [--no-memory]
+                             [--json results.json]
+
+Each stage runs on a fresh LitrevTools (no cache, no rate limits, fast retries) pointed at the
+mock servers of benchmarks/mock_servers.py, and is reported with its wall time, the number of
+requests it sent per endpoint, the connections it opened and its peak Python memory (tracemalloc). Tracing memory slows
+allocation-heavy stages down; use --no-memory for wall times only. No request leaves the machine.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('TQDM_DISABLE', '1')
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from litrevtools import LitrevTools  # noqa: E402
+from retry import RetryPolicy  # noqa: E402
+from mock_servers import MockServer, synthetic_corpus, CATEGORIES  # noqa: E402
+
+
+KEYWORDS = ['causal', ('diffusion', '~graph'), 'conformal']
+SOURCES = ['arxiv', 'semanticscholar']
+
+
+def stage_paperdicts_semanticscholar(lt, titles, papers):
+    return len(lt.paperdicts(titles, sources=['semanticscholar']))
+
+
+def stage_paperdicts_arxiv(lt, titles, papers):
+    return len(lt.paperdicts(titles, sources=['arxiv']))
+
+
+def stage_filter(lt, titles, papers):
+    return len(lt.filter(titles, keywords=KEYWORDS, manual=False, sources=SOURCES))
+
+
+def stage_citation_counts(lt, titles, papers):
+    return len(lt.citation_counts(titles)['citation counts'])
+
+
+def stage_bulldozer(lt, titles, papers):
+    # Snowballing from 1% of the titles, two hops
+    return len(lt.bulldozer(titles[:max(1, len(titles) // 100)], keywords=KEYWORDS, depth=2))
+
+
+def stage_parse_arxiv(lt, titles, papers):
+    # Harvest of the update window covering the len(titles) first papers of the corpus
+    start = papers[0]['updated'].strftime('%Y-%m-%d')
+    end = papers[len(titles) - 1]['updated'].strftime('%Y-%m-%d')
+    return len(lt.parse_arxiv(start=start, end=end, keywords=KEYWORDS))
+
+
+STAGES = {
+    'paperdicts_semanticscholar': stage_paperdicts_semanticscholar,
+    'paperdicts_arxiv': stage_paperdicts_arxiv,
+    'filter': stage_filter,
+    'citation_counts': stage_citation_counts,
+    'bulldozer': stage_bulldozer,
+    'parse_arxiv': stage_parse_arxiv,
+}
+
+
+def run_stage(server, stage, titles, papers, workers, arxiv_max_results, memory=True):
+    lt = LitrevTools(
+        arxiv_cats=CATEGORIES,
+        arxiv_max_results=arxiv_max_results,
+        workers=workers,
+        rate_limits={source: 0. for source in ['arxiv', 'semanticscholar', 'googlescholar', 'google']},
+        retry_policy=RetryPolicy(base_wait=0.01, max_wait=0.1, failure_threshold=10**9),
+        arxiv_api_url=server.url + '/api/query',
+        s2_api_url=server.url,
+        verbose=False,
+    )
+    server.reset_counts()
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    output_size = STAGES[stage](lt, titles, papers)
+    wall_time = time.perf_counter() - start
+    peak_memory = None
+    if memory:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    connections = server.connections
+    requests = server.reset_counts()
+    return {
+        'stage': stage,
+        'titles': len(titles),
+        'output': output_size,
+        'wall_s': wall_time,
+        'titles_per_s': len(titles) / wall_time,
+        'requests': sum(requests.values()),
+        'requests_by_endpoint': requests,
+        'connections': connections,
+        'retries': dict(lt.retry_policy.retries),
+        'metrics': lt.metrics.report(),
+        'peak_mb': peak_memory / 2**20 if peak_memory is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--arxiv-max-results', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.)
+    parser.add_argument('--error-rate', type=float, default=0.)
+    parser.add_argument('--rate-429', type=float, default=0.)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='do not trace memory allocations')
+    parser.add_argument('--json', default=None, help='also write the results to this file')
+    args = parser.parse_args()
+
+    papers = synthetic_corpus(max(args.sizes), seed=args.seed)
+    results = []
+    with MockServer(papers, latency=args.latency, error_rate=args.error_rate, rate_429=args.rate_429, seed=args.seed) as server:
+        print(f"{'stage':<28}{'titles':>8}{'output':>8}{'wall s':>10}{'titles/s':>10}{'requests':>10}{'conns':>7}{'retries':>9}{'peak MB':>9}")
+        for size in args.sizes:
+            titles = [paper['title'] for paper in papers[:size]]
+            for stage in args.stages:
+                result = run_stage(server, stage, titles, papers, args.workers, args.arxiv_max_results, memory=not args.no_memory)
+                results.append(result)
+                print(f"{stage:<28}{result['titles']:>8}{result['output']:>8}{result['wall_s']:>10.2f}{result['titles_per_s']:>10.1f}"
+                      f"{result['requests']:>10}{result['connections']:>7}{sum(result['retries'].values()):>9}{result['peak_mb'] or float('nan'):>9.1f}", flush=True)
+
+    if args.json is not None:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=1)
+
+
+if __name__ == '__main__':
+    main()
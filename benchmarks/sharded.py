@@ -0,0 +1,118 @@
+"""Sharded run against local mock servers, checked against the same run in a single process.
+
+    python benchmarks/sharded.py [--titles 400] [--shards 4] [--depth 2] [--latency 0.005] [--keep FOLDER]
+
+Each shard runs `shard.py run` (paperdicts, citation counts, downloads) in its own process, then
+a sharded bulldozer crawl runs round by round with `shard.py crawl`, the stores being merged
+with `shard.py merge` after each round. The merged results must equal those of one
+LitrevTools run over all the titles: same paperdicts, citation counts, PDFs and crawled titles.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_servers import MockServer, synthetic_corpus  # noqa: E402
+from bibstream import iter_entries  # noqa: E402
+from litrevtools import LitrevTools  # noqa: E402
+from retry import RetryPolicy  # noqa: E402
+import shard  # noqa: E402
+
+
+SHARD_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shard.py')
+KEYWORDS = ['causal', 'diffusion', 'graph']
+
+
+def run_shards(command, n_shards, server, folder, *args):
+    # One process per shard, all running at the same time
+    processes = [subprocess.Popen([sys.executable, SHARD_SCRIPT, command, os.path.join(folder, f'shard-{i}'),
+                                   '--shard', str(i), '--shards', str(n_shards), '--arxiv-api-url', server.url + '/api/query',
+                                   '--s2-api-url', server.url, '--no-rate-limits', '--quiet', '--workers', '4', *args],
+                                  stdout=subprocess.DEVNULL)
+                 for i in range(n_shards)]
+    if any(process.wait() != 0 for process in processes):
+        raise RuntimeError(f'A shard failed on {command}')
+    return [os.path.join(folder, f'shard-{i}') for i in range(n_shards)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--titles', type=int, default=400)
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.)
+    parser.add_argument('--keep', default=None, help='folder to keep the stores in (temporary otherwise)')
+    args = parser.parse_args()
+
+    papers = synthetic_corpus(args.titles)
+    titles = [paper['title'] for paper in papers]
+    seeds = titles[::20]
+    folder = args.keep if args.keep is not None else tempfile.mkdtemp()
+    titles_path = os.path.join(folder, 'titles.txt')
+    seeds_path = os.path.join(folder, 'seeds.txt')
+    os.makedirs(folder, exist_ok=True)
+    with open(titles_path, 'w') as titles_file:
+        titles_file.write('\n'.join(titles))
+    with open(seeds_path, 'w') as seeds_file:
+        seeds_file.write('\n'.join(seeds))
+    keywords = repr(KEYWORDS)
+
+    with MockServer(papers, latency=args.latency) as server:
+        start = time.monotonic()
+        stores = run_shards('run', args.shards, server, os.path.join(folder, 'run'), '--titles', titles_path, '--sources', 'arxiv', 'semanticscholar')
+        summary = shard.merge(stores, os.path.join(folder, 'merged'))
+        print(f'sharded run: {time.monotonic() - start:.1f}s, {json.dumps(summary)}')
+
+        start = time.monotonic()
+        crawl_folder = os.path.join(folder, 'crawl')
+        merged = os.path.join(crawl_folder, 'merged')
+        stores = run_shards('crawl', args.shards, server, crawl_folder, '--titles', seeds_path, '--keywords', keywords, '--depth', str(args.depth))
+        rounds = 1
+        while shard.merge(stores, merged)['frontier'] > 0:
+            stores = run_shards('crawl', args.shards, server, crawl_folder, '--round-graph', os.path.join(merged, shard.GRAPH_NAME),
+                                '--keywords', keywords, '--depth', str(args.depth))
+            rounds += 1
+        lt = LitrevTools(verbose=False, arxiv_api_url=server.url + '/api/query', s2_api_url=server.url)
+        crawled = shard.select(lt, merged, seeds, keywords=KEYWORDS, depth=args.depth)
+        print(f'sharded crawl: {time.monotonic() - start:.1f}s, {rounds} rounds, {len(crawled)} titles')
+
+        start = time.monotonic()
+        lt = LitrevTools(verbose=False, workers=4, arxiv_api_url=server.url + '/api/query', s2_api_url=server.url,
+                         rate_limits={source: 0. for source in ['arxiv', 'semanticscholar']},
+                         retry_policy=RetryPolicy(base_wait=0.01, max_wait=0.1))
+        single = os.path.join(folder, 'single')
+        os.makedirs(os.path.join(single, shard.PDFS_NAME), exist_ok=True)
+        paperdicts, reports = lt.download(titles, os.path.join(single, shard.PDFS_NAME), sources=['arxiv', 'semanticscholar'], return_report=True)
+        counts = lt.citation_counts(titles)
+        single_crawled = lt.bulldozer(seeds, keywords=KEYWORDS, depth=args.depth)
+        print(f'single process: {time.monotonic() - start:.1f}s')
+
+    merged_paperdicts = list(iter_entries(os.path.join(folder, 'merged', shard.PAPERDICTS_NAME)))
+    with open(os.path.join(folder, 'merged', shard.CITATION_COUNTS_NAME)) as counts_file:
+        merged_counts = json.load(counts_file)
+    with open(os.path.join(folder, 'merged', shard.PDFS_NAME, '.downloads.json')) as manifest_file:
+        merged_manifest = json.load(manifest_file)
+    with open(os.path.join(single, shard.PDFS_NAME, '.downloads.json')) as manifest_file:
+        single_manifest = json.load(manifest_file)
+    checks = {
+        'paperdicts': {d['ID']: d['title'] for d in merged_paperdicts} == {d['ID']: d['title'] for d in paperdicts},
+        'citation counts': merged_counts['citation counts'] == counts['citation counts'],
+        'pdfs': {name: record['sha256'] for name, record in merged_manifest.items()}
+                == {name: record['sha256'] for name, record in single_manifest.items()},
+        'crawl': sorted(crawled) == sorted(single_crawled),
+    }
+    for check, ok in checks.items():
+        print(f"{check:<16}{'ok' if ok else 'MISMATCH'}")
+    if args.keep is None:
+        import shutil
+        shutil.rmtree(folder)
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == '__main__':
+    main()
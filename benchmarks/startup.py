@@ -0,0 +1,72 @@
+"""Startup benchmark: time of `import litrevtools` and of `LitrevTools()`, in fresh interpreters.
+
+    python benchmarks/startup.py [--runs 10] [--max-import-ms 300] [--max-init-ms 50]
+
+Exits with status 1 if a median exceeds its threshold, or if importing litrevtools or
+constructing LitrevTools() loads one of the backend modules, which should only be
+imported on first use.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BACKEND_MODULES = ['scholarly', 'semanticscholar', 'arxiv', 'googlesearch', 'feedparser', 'bibtexparser', 'requests', 'httpx']
+
+PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import litrevtools
+imported = time.perf_counter()
+litrevtools.LitrevTools()
+constructed = time.perf_counter()
+print(json.dumps({{
+    'import_ms': 1000 * (imported - start),
+    'init_ms': 1000 * (constructed - imported),
+    'loaded_backends': [name for name in {BACKEND_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+def measure(runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', PROBE], cwd=REPO, capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        'runs': runs,
+        'import_ms': statistics.median(sample['import_ms'] for sample in samples),
+        'init_ms': statistics.median(sample['init_ms'] for sample in samples),
+        'loaded_backends': sorted({name for sample in samples for name in sample['loaded_backends']}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-import-ms', type=float, default=None)
+    parser.add_argument('--max-init-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    result = measure(args.runs)
+    print(json.dumps(result, indent=1))
+
+    failures = []
+    if args.max_import_ms is not None and result['import_ms'] > args.max_import_ms:
+        failures.append(f"import takes {result['import_ms']:.0f} ms > {args.max_import_ms:.0f} ms")
+    if args.max_init_ms is not None and result['init_ms'] > args.max_init_ms:
+        failures.append(f"LitrevTools() takes {result['init_ms']:.1f} ms > {args.max_init_ms:.1f} ms")
+    if len(result['loaded_backends']) > 0:
+        failures.append(f"backends loaded at startup: {', '.join(result['loaded_backends'])}")
+    for failure in failures:
+        print('REGRESSION:', failure)
+    sys.exit(1 if len(failures) > 0 else 0)
+
+
+if __name__ == '__main__':
+    main()
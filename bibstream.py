@@ -0,0 +1,166 @@
+import logging
+import os
+import re
+import shutil
+import threading
+
+import utils
+
+
+bibtexparser = utils.LazyModule('bibtexparser')
+
+logger = logging.getLogger('litrevtools.bibstream')
+
+ENTRY_START = re.compile(rb'^\s*@\s*([A-Za-z]+)\s*[{(]\s*([^,\s]*)')
+
+
+def _brace_delta(line):
+    line = line.replace(b'\\{', b'').replace(b'\\}', b'')
+    return line.count(b'{') - line.count(b'}')
+
+
+def scan_entries(path):
+    """Yields (offset, entry type, ID, complete) for each entry of a .bib file, without parsing it.
+
+    Entries are expected to start at the beginning of a line, as written by bibtexparser and
+    most tools; complete is False for an entry whose braces are still open at the end of the file.
+    """
+    offset = 0
+    depth = 0
+    current = None
+    with open(path, 'rb') as bib_file:
+        for line in bib_file:
+            match = ENTRY_START.match(line) if depth <= 0 else None
+            if match is not None:
+                if current is not None:
+                    yield current + (True,)
+                current = (offset, match.group(1).decode('ascii').lower(), match.group(2).decode('utf-8', 'replace'))
+                depth = 0
+            depth += _brace_delta(line)
+            offset += len(line)
+    if current is not None:
+        yield current + (depth <= 0,)
+
+
+def _entry_ids_after(path, offset):
+    # IDs of the entries starting after the line at offset, whatever their braces
+    with open(path, 'rb') as bib_file:
+        bib_file.seek(offset)
+        bib_file.readline()
+        for line in bib_file:
+            match = ENTRY_START.match(line)
+            if match is not None and match.group(1).lower() not in (b'string', b'comment', b'preamble'):
+                yield match.group(2).decode('utf-8', 'replace')
+
+
+def iter_entries(path, batch_size=200):
+    """Yields the entries (paperdicts) of a .bib file, parsing batch_size entries at a time.
+
+    Gives the same entries as bibtexparser.loads on the whole file, without holding its
+    parsed database in memory. @string macros apply to the entries that follow them.
+    """
+    parser = bibtexparser.bparser.BibTexParser()
+    parser.expect_multiple_parse = True
+    chunk = []
+    n_entries = 0
+    depth = 0
+
+    def parse(lines):
+        parser.parse(b''.join(lines).decode('utf-8'), partial=True)
+        entries = parser.bib_database.entries
+        parser.bib_database.entries = []
+        parser.bib_database.comments = []
+        parser.bib_database.preambles = []
+        return entries
+
+    with open(path, 'rb') as bib_file:
+        for line in bib_file:
+            if depth <= 0 and ENTRY_START.match(line) is not None:
+                if n_entries >= batch_size:
+                    yield from parse(chunk)
+                    chunk, n_entries = [], 0
+                n_entries += 1
+                depth = 0
+            depth += _brace_delta(line)
+            chunk.append(line)
+    if len(chunk) > 0:
+        yield from parse(chunk)
+
+
+def format_entry(paperdict):
+    from bibtexparser.bibdatabase import BibDatabase
+    from bibtexparser.bwriter import BibTexWriter
+    db = BibDatabase()
+    db.entries = [paperdict]
+    return BibTexWriter().write(db)
+
+
+class BibWriter():
+    """Appends paperdicts to a .bib file one at a time, skipping IDs already in the file.
+
+    Each entry is written in a single write, flushed (and fsynced, unless fsync is False)
+    before `write` returns, so that a crash loses at most the entry being written. An entry
+    left incomplete by an earlier crash (the last entry, with no other entry after it) is
+    truncated when the file is opened again, after copying the file to `path + '.bak'`. Any
+    other unbalanced entry is left as it is, with a warning.
+    """
+
+    def __init__(self, path, fsync=True):
+        self.path = os.path.expanduser(path)
+        self.fsync = fsync
+        self.ids = set()
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            incomplete = None
+            for offset, entry_type, entry_id, complete in scan_entries(self.path):
+                if not complete:
+                    incomplete = (offset, entry_id)
+                elif entry_type not in ('string', 'comment', 'preamble'):
+                    self.ids.add(entry_id)
+            if incomplete is not None:
+                self._recover(*incomplete)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _recover(self, offset, entry_id):
+        # An unbalanced entry swallows the entries after it: it is only a fragment of an interrupted
+        # write if no other entry starts after it
+        later_ids = list(_entry_ids_after(self.path, offset))
+        if len(later_ids) > 0:
+            logger.warning(f"Entry '{entry_id}' of {self.path} has unbalanced braces; the file is left as it is")
+            self.ids.update([entry_id] + later_ids)
+            return
+        size = os.path.getsize(self.path)
+        shutil.copyfile(self.path, self.path + '.bak')
+        with open(self.path, 'r+b') as bib_file:
+            bib_file.truncate(offset)
+        logger.warning(f"Removed the incomplete entry '{entry_id}' ({size - offset} bytes) at the end of {self.path}; "
+                       f"the file before is in {self.path + '.bak'}")
+
+    def __contains__(self, entry_id):
+        return entry_id in self.ids
+
+    def write(self, paperdict):
+        """Appends paperdict unless its ID is already in the file; returns whether it was written."""
+        text = format_entry(paperdict)
+        with self._lock:
+            if paperdict['ID'] in self.ids:
+                return False
+            self._file.write(text + '\n')
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.ids.add(paperdict['ID'])
+        return True
+
+    def write_many(self, paperdicts):
+        return [self.write(paperdict) for paperdict in paperdicts]
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,120 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+
+DAY = 24 * 3600
+
+DEFAULT_TTLS = {
+    'arxiv': 30 * DAY,
+    'arxiv_id': 365 * DAY,
+    'arxiv_bibtex': 365 * DAY,
+    'google': 30 * DAY,
+    'googlescholar': 30 * DAY,
+    'semanticscholar': 7 * DAY,
+    'semanticscholar_fields': 7 * DAY,
+}
+
+
+class MetadataCache():
+    """On-disk cache of remote lookups, keyed by (source, normalized key).
+
+    Each source has its own TTL. Lookups that found nothing (None) are stored
+    as negative entries with their own, shorter TTL. Once the cache holds more
+    than `max_entries` entries, the least recently accessed ones are evicted.
+    """
+
+    def __init__(self, path, ttls=None, default_ttl=30 * DAY, negative_ttl=7 * DAY, max_entries=100000):
+        path = os.path.expanduser(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS, **(ttls if ttls is not None else {}))
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+        self._inserts_since_check = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'source TEXT NOT NULL, key TEXT NOT NULL, value BLOB, negative INTEGER NOT NULL, '
+            'created REAL NOT NULL, accessed REAL NOT NULL, PRIMARY KEY (source, key))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+
+    def _ttl(self, source, negative):
+        ttl = self.ttls.get(source, self.default_ttl)
+        return min(ttl, self.negative_ttl) if negative else ttl
+
+    def get(self, source, key):
+        """Return (hit, value). A hit with value None is a cached negative result."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, negative, created FROM entries WHERE source = ? AND key = ?', (source, key)
+            ).fetchone()
+            value = None
+            if row is not None and now - row[2] > self._ttl(source, bool(row[1])):
+                self._conn.execute('DELETE FROM entries WHERE source = ? AND key = ?', (source, key))
+                row = None
+            elif row is not None and not row[1]:
+                try:
+                    value = pickle.loads(row[0])
+                except Exception:
+                    # e.g. a value whose class changed with an upgrade of its library: looked up again
+                    self._conn.execute('DELETE FROM entries WHERE source = ? AND key = ?', (source, key))
+                    row = None
+            if row is None:
+                self.misses[source] = self.misses.get(source, 0) + 1
+                return False, None
+            self._conn.execute('UPDATE entries SET accessed = ? WHERE source = ? AND key = ?', (now, source, key))
+            self.hits[source] = self.hits.get(source, 0) + 1
+        return True, value
+
+    def set(self, source, key, value):
+        now = time.time()
+        negative = value is None
+        blob = None if negative else pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (source, key, value, negative, created, accessed) VALUES (?, ?, ?, ?, ?, ?)',
+                (source, key, blob, int(negative), now, now)
+            )
+            self._inserts_since_check += 1
+            if self._inserts_since_check >= max(1, self.max_entries // 100):
+                self._inserts_since_check = 0
+                self._evict()
+
+    def _evict(self):
+        count = self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                'DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY accessed LIMIT ?)',
+                (count - self.max_entries,)
+            )
+
+    def clear(self, source=None):
+        with self._lock:
+            if source is None:
+                self._conn.execute('DELETE FROM entries')
+            else:
+                self._conn.execute('DELETE FROM entries WHERE source = ?', (source,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def stats(self):
+        sources = sorted(set(self.hits) | set(self.misses))
+        return {source: {'hits': self.hits.get(source, 0), 'misses': self.misses.get(source, 0)} for source in sources}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import utils
+from retry import RetryPolicy
+
+
+requests = utils.LazyModule('requests')
+
+
+MANIFEST_NAME = '.downloads.json'
+
+
+def sha256_of(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Downloader():
+    """Downloads files into `folder` on a bounded pool of workers sharing pooled connections.
+
+    Each file is streamed to a '.part' file, resumed with a Range request if a previous attempt
+    was interrupted, and only moved to its final name once complete. Files already complete
+    (same checksum as recorded in the folder's manifest, or same size as announced by the
+    server) are skipped. With `session`, requests go through that session (e.g. the pooled one of
+    a Transport), left open by `close`.
+    """
+
+    def __init__(self, folder, workers=8, timeout=(10, 60), chunk_size=1 << 16, retry_policy=None, limiter_for=None, session=None):
+        self.folder = folder
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.limiter_for = limiter_for  # url -> RateLimiter or None
+        self._own_session = session is None
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.manifest_path = os.path.join(folder, MANIFEST_NAME)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as manifest_file:
+                self.manifest = json.load(manifest_file)
+        self._lock = threading.Lock()
+        self._futures = {}  # filename -> future, so that a file is only fetched once at a time
+
+    def submit(self, url, filename):
+        # A file already submitted (e.g. two titles resolving to the same ID) shares the future of the first submission
+        with self._lock:
+            future = self._futures.get(filename)
+            if future is None:
+                future = self._futures[filename] = self.executor.submit(self.download, url, filename)
+            return future
+
+    def _request(self, url, method='get', **kwargs):
+        limiter = self.limiter_for(url) if self.limiter_for is not None else None
+        if limiter is not None:
+            limiter.wait()
+        r = self.session.request(method, url, timeout=self.timeout, allow_redirects=True, **kwargs)
+        r.raise_for_status()
+        return r
+
+    def _is_complete(self, url, path):
+        if not os.path.exists(path):
+            return False
+        recorded = self.manifest.get(os.path.basename(path))
+        if recorded is not None and recorded['size'] == os.path.getsize(path):
+            return recorded['sha256'] == sha256_of(path)
+        try:
+            r = self.retry_policy.call(self._request, url, method='head', host=urlparse(url).netloc)
+        except Exception:
+            return False
+        size = r.headers.get('Content-Length')
+        return size is not None and int(size) == os.path.getsize(path)
+
+    def _fetch(self, url, path):
+        # Returns the number of bytes received, resuming from the '.part' file if there is one
+        part_path = path + '.part'
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset > 0 else {}
+        try:
+            r = self._request(url, headers=headers, stream=True)
+        except requests.HTTPError as exc:
+            if offset > 0 and exc.response is not None and exc.response.status_code == 416:
+                os.remove(part_path) # stale '.part' file, restart from scratch
+                return self._fetch(url, path)
+            raise
+        with r:
+            if r.status_code != 206:
+                offset = 0
+            expected = r.headers.get('Content-Length')
+            expected = offset + int(expected) if expected is not None else None
+            received = 0
+            with open(part_path, 'ab' if offset > 0 else 'wb') as part_file:
+                for chunk in r.iter_content(chunk_size=self.chunk_size):
+                    part_file.write(chunk)
+                    received += len(chunk)
+        if expected is not None and os.path.getsize(part_path) != expected:
+            raise IOError(f'Incomplete download of {url}: {os.path.getsize(part_path)} of {expected} bytes')
+        os.replace(part_path, path)
+        return received
+
+    def _record(self, path, url):
+        with self._lock:
+            self.manifest[os.path.basename(path)] = {'url': url, 'size': os.path.getsize(path), 'sha256': sha256_of(path)}
+            utils.save_json(self.manifest_path, self.manifest, indent=1)
+
+    def download(self, url, filename):
+        path = os.path.join(self.folder, filename)
+        report = {'file': filename, 'url': url, 'status': None, 'bytes': 0, 'error': None, 'seconds': 0.}
+        start = time.monotonic()
+        try:
+            if self._is_complete(url, path):
+                report['status'] = 'skipped'
+                return report
+            report['status'] = 'resumed' if os.path.exists(path + '.part') else 'downloaded'
+            report['bytes'] = self.retry_policy.call(self._fetch, url, path, host=urlparse(url).netloc)
+            self._record(path, url)
+        except Exception as exc:
+            report['status'] = 'failed'
+            report['error'] = f'{type(exc).__name__}: {exc}'
+        finally:
+            report['seconds'] = time.monotonic() - start
+        return report
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self._own_session:
+            self.session.close()
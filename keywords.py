@@ -0,0 +1,132 @@
+class KeywordMatcher():
+    """Keyword expression compiled once, then evaluated on many entries.
+
+    Expressions follow the rules of `LitrevTools._filter_entry`: a tuple is an AND of its
+    elements, a list is an OR, a string starting with '~' is negated, and any other string
+    matches if it is a case-insensitive substring of one of the entry's fields. None matches
+    everything. `match` searches the keywords lazily, so that an AND or an OR stops at its first
+    decisive keyword, and each distinct keyword at most once per entry; `hits` and `audit`
+    search them all and evaluate the expression on the resulting bitset.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = keywords
+        self.leaves = []
+        self._leaf_bits = {}
+        self._n_leaf_uses = 0
+        self._evaluate = self._compile(keywords)
+
+    def _text(self, args):
+        # Lowercased fields of an entry, or None if it has none
+        texts = [arg.lower() for arg in args if arg is not None]
+        return '\x00'.join(texts) if len(texts) > 0 else None
+
+    @classmethod
+    def compile(cls, keywords):
+        return keywords if isinstance(keywords, cls) else cls(keywords)
+
+    def _leaf(self, keyword):
+        keyword = keyword.lower()
+        self._n_leaf_uses += 1
+        if keyword not in self._leaf_bits:
+            self._leaf_bits[keyword] = 1 << len(self.leaves)
+            self.leaves.append(keyword)
+        return self._leaf_bits[keyword]
+
+    def _compile(self, keywords):
+        # Functions of has(keyword), which tells whether the entry contains keyword
+        if keywords is None:
+            return lambda has: True
+        elif isinstance(keywords, tuple):
+            children = [self._compile(keyword) for keyword in keywords]
+            return lambda has: all(child(has) for child in children)
+        elif isinstance(keywords, list):
+            children = [self._compile(keyword) for keyword in keywords]
+            return lambda has: any(child(has) for child in children)
+        elif isinstance(keywords, str) and keywords[:1] == '~':
+            child = self._compile(keywords[1:])
+            return lambda has: not child(has)
+        elif isinstance(keywords, str):
+            self._leaf(keywords)
+            keyword = keywords.lower()
+            return lambda has: has(keyword)
+        else:
+            return self._compile(str(keywords))
+
+    def combine(self, leaf_sets, everything):
+        """Evaluates the expression on sets instead of one entry: leaf_sets maps each leaf to the set
+        of entries containing it, as values supporting &, | and ~ (e.g. numpy boolean masks or int
+        bitsets); everything is the set of all entries."""
+        def evaluate(keywords):
+            if keywords is None:
+                return everything
+            elif isinstance(keywords, tuple):
+                result = everything
+                for keyword in keywords:
+                    result = result & evaluate(keyword)
+                return result
+            elif isinstance(keywords, list):
+                result = everything & ~everything
+                for keyword in keywords:
+                    result = result | evaluate(keyword)
+                return result
+            elif isinstance(keywords, str) and keywords[:1] == '~':
+                return everything & ~evaluate(keywords[1:])
+            elif isinstance(keywords, str):
+                return leaf_sets[keywords.lower()]
+            else:
+                return evaluate(str(keywords))
+        return evaluate(self.keywords)
+
+    def bits(self, *args):
+        # Bit i is set if self.leaves[i] is found in one of the args
+        if len(self.leaves) == 0:
+            return 0
+        text = self._text(args)
+        if text is None:
+            return 0
+        bits = 0
+        for keyword, bit in self._leaf_bits.items():
+            if keyword in text:
+                bits |= bit
+        return bits
+
+    def _evaluate_bits(self, bits):
+        return self._evaluate(lambda keyword: bits & self._leaf_bits[keyword] != 0)
+
+    def match(self, *args):
+        if len(self.leaves) == 0:
+            return self._evaluate(None)
+        text = self._text(args)
+        if text is None:
+            return self._evaluate(lambda keyword: False)
+        if self._n_leaf_uses == len(self.leaves):
+            return self._evaluate(text.__contains__)  # each keyword appears once in the expression
+        found = {}
+        def has(keyword):
+            if keyword not in found:
+                found[keyword] = keyword in text
+            return found[keyword]
+        return self._evaluate(has)
+
+    def match_many(self, entries):
+        # entries: iterable of tuples of fields (e.g. (title, abstract))
+        if len(self.leaves) == 0:
+            result = self._evaluate(None)
+            return [result for _ in entries]
+        return [self.match(*entry) for entry in entries]
+
+    def hits(self, *args):
+        # Keywords found in the entry, whether or not the whole expression matches
+        bits = self.bits(*args)
+        return [keyword for keyword in self.leaves if bits & self._leaf_bits[keyword]]
+
+    def audit(self, entries):
+        result = []
+        for entry in entries:
+            bits = self.bits(*entry)
+            result.append({
+                'match': self._evaluate_bits(bits),
+                'hits': [keyword for keyword in self.leaves if bits & self._leaf_bits[keyword]],
+            })
+        return result
@@ -0,0 +1,85 @@
+import glob
+import os
+import pickle
+import threading
+import time
+
+import utils
+from bibstream import iter_entries
+from titles import title_key
+
+
+def bib_title_key(title):
+    return title_key(title.replace('{', '').replace('}', ''))
+
+
+class BibLibrary():
+    """Index of the entries of every .bib file under `folder`, by title key.
+
+    Files are only re-parsed when their mtime or size changed, at most once every
+    `refresh_interval` seconds. If `index_path` is given, the index is persisted there
+    so that later runs only parse the files changed in between.
+    """
+
+    def __init__(self, folder, index_path=None, refresh_interval=5.):
+        self.folder = os.path.expanduser(folder)
+        self.index_path = os.path.expanduser(index_path) if index_path is not None else None
+        self.refresh_interval = refresh_interval
+        self._files = {}  # path -> (mtime_ns, size, entries)
+        self._by_key = {}
+        self._last_refresh = None
+        self._lock = threading.Lock()
+        if self.index_path is not None and os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'rb') as index_file:
+                    self._files = pickle.load(index_file)
+            except Exception:
+                self._files = {}
+            self._rebuild()
+
+    def _rebuild(self):
+        by_key = {}
+        for path in sorted(self._files):
+            for paperdict in self._files[path][2]:
+                if 'title' in paperdict:
+                    by_key[bib_title_key(paperdict['title'])] = paperdict
+        self._by_key = by_key
+
+    def _save(self):
+        with utils.atomic_write(self.index_path, 'wb') as index_file:
+            pickle.dump(self._files, index_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def refresh(self, force=False):
+        with self._lock:
+            if not force and self._last_refresh is not None and time.monotonic() - self._last_refresh < self.refresh_interval:
+                return
+            files = {}
+            changed = False
+            for path in glob.glob(os.path.join(self.folder, '**', '*.bib'), recursive=True):
+                stat = os.stat(path)
+                previous = self._files.get(path)
+                if previous is not None and previous[:2] == (stat.st_mtime_ns, stat.st_size):
+                    files[path] = previous
+                    continue
+                files[path] = (stat.st_mtime_ns, stat.st_size, list(iter_entries(path)))
+                changed = True
+            changed = changed or len(files) != len(self._files)
+            self._files = files
+            if changed:
+                self._rebuild()
+                if self.index_path is not None:
+                    self._save()
+            self._last_refresh = time.monotonic()
+
+    def get(self, title):
+        self.refresh()
+        paperdict = self._by_key.get(bib_title_key(title))
+        return dict(**paperdict) if paperdict is not None else None
+
+    def entries(self):
+        self.refresh()
+        return {key: dict(**paperdict) for key, paperdict in self._by_key.items()}
+
+    def __len__(self):
+        self.refresh()
+        return len(self._by_key)
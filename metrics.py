@@ -0,0 +1,160 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+
+logger = logging.getLogger('litrevtools.metrics')
+
+# Upper bounds (in seconds) of the buckets of the latency histograms
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10., 30., 60., float('inf'))
+
+# Outcomes of a call: 'found', 'not found', 'mismatch' (found, but another title), 'error' or 'cancelled'
+OUTCOMES = ('found', 'not found', 'mismatch', 'error', 'cancelled')
+
+
+def _new_stats():
+    return {
+        'calls': 0,
+        'latency': 0.,
+        'histogram': [0] * len(LATENCY_BUCKETS),
+        'wins': 0,
+        'retries': 0,
+        'bytes': 0,
+        **{outcome: 0 for outcome in OUTCOMES},
+    }
+
+
+def _quantile(histogram, q):
+    # Upper bound of the bucket holding the q-quantile
+    total = sum(histogram)
+    if total == 0:
+        return None
+    count = 0
+    for bound, n in zip(LATENCY_BUCKETS, histogram):
+        count += n
+        if count >= q * total:
+            return bound
+    return LATENCY_BUCKETS[-1]
+
+
+class Metrics():
+    """Per-(operation, source) counters and latency histograms of a run.
+
+    Every event is logged at DEBUG level on the 'litrevtools.metrics' logger and passed to each
+    hook, as `hook(event, fields)`: 'call' (operation, source, latency, outcome), 'win'
+    (operation, source), 'retry' (source, error, wait), 'download' (source, status, bytes,
+    latency) and 'run' (operation, latency, size). Hooks must be thread-safe; an exception
+    raised by a hook is logged and otherwise ignored.
+    """
+
+    def __init__(self, hooks=None):
+        self.hooks = list(hooks) if hooks is not None else []
+        self.stats = {}  # (operation, source) -> counters
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def _emit(self, event, fields):
+        logger.debug('%s %s', event, fields)
+        for hook in self.hooks:
+            try:
+                hook(event, fields)
+            except Exception:
+                logger.exception(f'Metrics hook {hook!r} failed on {event!r}')
+
+    def _stats(self, operation, source):
+        key = (operation, source)
+        if key not in self.stats:
+            self.stats[key] = _new_stats()
+        return self.stats[key]
+
+    def record_call(self, operation, source, latency, outcome='found'):
+        with self._lock:
+            stats = self._stats(operation, source)
+            stats['calls'] += 1
+            stats['latency'] += latency
+            stats[outcome] += 1
+            stats['histogram'][next(i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound)] += 1
+        self._emit('call', {'operation': operation, 'source': source, 'latency': latency, 'outcome': outcome})
+
+    @contextmanager
+    def timed(self, operation, source):
+        """Records the enclosed call; set call['outcome'] to change the default 'found' outcome."""
+        call = {'outcome': 'found'}
+        start = time.monotonic()
+        try:
+            yield call
+        except Exception as exc:
+            call['outcome'] = 'cancelled' if type(exc).__name__ == 'Cancelled' else 'error'
+            raise
+        finally:
+            self.record_call(operation, source, time.monotonic() - start, call['outcome'])
+
+    def record_win(self, operation, source):
+        with self._lock:
+            self._stats(operation, source)['wins'] += 1
+        self._emit('win', {'operation': operation, 'source': source})
+
+    def record_retry(self, source, exc, wait):
+        with self._lock:
+            self._stats('retry', source)['retries'] += 1
+        self._emit('retry', {'source': source, 'error': f'{type(exc).__name__}: {exc}', 'wait': wait})
+
+    def record_download(self, source, status, n_bytes, latency):
+        with self._lock:
+            stats = self._stats('download', source)
+            stats['calls'] += 1
+            stats['latency'] += latency
+            stats['bytes'] += n_bytes
+            stats['found' if status in ('downloaded', 'resumed', 'skipped') else 'error'] += 1
+            stats['histogram'][next(i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound)] += 1
+        self._emit('download', {'source': source, 'status': status, 'bytes': n_bytes, 'latency': latency})
+
+    def record_run(self, operation, latency, size):
+        self._emit('run', {'operation': operation, 'latency': latency, 'size': size})
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+
+    def report(self):
+        """{operation: {source: summary}}, with rates over the number of calls and latencies in seconds."""
+        report = {}
+        with self._lock:
+            for (operation, source), stats in sorted(self.stats.items(), key=(lambda item: (item[0][0], str(item[0][1])))):
+                calls = stats['calls']
+                summary = {'calls': calls}
+                if calls > 0:
+                    summary.update({
+                        'found rate': stats['found'] / calls,
+                        'mismatch rate': stats['mismatch'] / calls,
+                        'error rate': stats['error'] / calls,
+                        'win rate': stats['wins'] / calls,
+                        'mean latency': stats['latency'] / calls,
+                        'p50 latency': _quantile(stats['histogram'], .5),
+                        'p90 latency': _quantile(stats['histogram'], .9),
+                        'p99 latency': _quantile(stats['histogram'], .99),
+                    })
+                if stats['retries'] > 0:
+                    summary['retries'] = stats['retries']
+                if stats['bytes'] > 0:
+                    summary['bytes'] = stats['bytes']
+                report.setdefault(operation, {})[source] = summary
+        return report
+
+    def summary(self):
+        """Plain-text table of `report()`."""
+        lines = [f"{'operation':<26}{'source':<17}{'calls':>7}{'found':>7}{'mismatch':>9}{'errors':>7}{'mean s':>8}{'p90 s':>7}{'retries':>8}"]
+        for operation, sources in self.report().items():
+            for source, summary in sources.items():
+                calls = summary['calls']
+                if calls == 0:
+                    lines.append(f"{operation:<26}{str(source):<17}{'-':>7}{'':>7}{'':>9}{'':>7}{'':>8}{'':>7}{summary.get('retries', 0):>8}")
+                    continue
+                lines.append(
+                    f"{operation:<26}{str(source):<17}{calls:>7}{summary['found rate']:>7.0%}{summary['mismatch rate']:>9.0%}"
+                    f"{summary['error rate']:>7.0%}{summary['mean latency']:>8.2f}{summary['p90 latency']:>7.2g}{summary.get('retries', 0):>8}"
+                )
+        return '\n'.join(lines)
@@ -0,0 +1,212 @@
+import queue
+import threading
+import time
+
+from keywords import KeywordMatcher
+from titles import title_key
+
+
+DONE = object()  # end of stream, passed from stage to stage
+
+
+class Stage():
+    """Worker threads applying `func` to the items of `inbox` and putting its outputs in `outbox`.
+
+    `func` returns a list of outputs (empty to drop the item). Queues are bounded, so a slow
+    stage blocks the ones feeding it instead of letting items pile up. An item whose `func`
+    raised is counted as failed and dropped.
+    """
+
+    def __init__(self, name, func, workers, inbox, outbox, say=print):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.inbox = inbox
+        self.outbox = outbox
+        self.say = say
+        self.received = 0
+        self.emitted = 0
+        self.failed = 0
+        self._running = workers
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._work, name=f'{self.name}-{i}', daemon=True) for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _work(self):
+        while True:
+            item = self.inbox.get()
+            if item is DONE:
+                self.inbox.put(DONE)  # for the other workers of this stage
+                break
+            with self._lock:
+                self.received += 1
+            try:
+                outputs = self.func(item)
+            except Exception as exc:
+                with self._lock:
+                    self.failed += 1
+                self.say(f"Pipeline stage '{self.name}' failed on {item!r}: {type(exc).__name__}: {exc}")
+                continue
+            for output in outputs:
+                self.outbox.put(output)
+            with self._lock:
+                self.emitted += len(outputs)
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last:
+            self.outbox.put(DONE)
+
+    def progress(self):
+        with self._lock:
+            return {'received': self.received, 'emitted': self.emitted, 'failed': self.failed,
+                    'queued': self.inbox.qsize(), 'running': self._running}
+
+
+class Pipeline():
+    """Streaming review: fetch abstracts -> screen on keywords -> resolve paperdicts -> download PDFs.
+
+    Stages run concurrently and are connected by bounded queues of `queue_size` items, so that
+    screening starts with the first abstracts and PDFs download while later titles are still
+    being resolved. The result is the one of the batch path, i.e. of
+    `lt.paperdicts(lt.filter(titles, keywords, manual=False, sources=sources), sources=resolve_sources)`
+    followed by `lt.download` into `folder` (if given).
+    """
+
+    def __init__(self, lt, keywords=None, sources=['arxiv', 'semanticscholar'], resolve_sources=None, folder=None,
+                 workers=None, download_workers=8, queue_size=64, arxiv_batch_size=20, progress_interval=10.):
+        self.lt = lt
+        self.matcher = KeywordMatcher.compile(keywords)
+        self.sources = [sources] if isinstance(sources, str) else list(sources)
+        # paperdict's default sources, as in the batch path
+        self.resolve_sources = ['arxiv', 'own', 'googlescholar', 'semanticscholar'] if resolve_sources is None else (
+            [resolve_sources] if isinstance(resolve_sources, str) else list(resolve_sources))
+        self.folder = folder
+        self.workers = max(1, lt.workers if workers is None else workers)
+        self.download_workers = download_workers
+        self.queue_size = queue_size
+        self.arxiv_batch_size = arxiv_batch_size if 'arxiv' in self.sources + self.resolve_sources else 1
+        self.progress_interval = progress_interval
+        self.stages = []
+        self.fed = 0
+        self.feed_error = None
+        self._prefetched = []  # title keys prefetched on arXiv, released at the end of the stream
+
+    def _prefetch(self, batch):
+        # batch: list of (index, title); resolves the arXiv titles of the batch in one query (see LitrevTools.prefetch_arxiv)
+        if self.arxiv_batch_size > 1:
+            try:
+                self._prefetched.extend(self.lt.prefetch_arxiv([title for _, title in batch]))
+            except Exception as exc:
+                # Not fatal: the titles are then looked up one by one
+                self.lt.say(f'arXiv prefetch failed ({type(exc).__name__}: {exc})')
+        return [{'index': index, 'title': title} for index, title in batch]
+
+    def _fetch(self, item):
+        item['screening paperdict'] = self.lt.paperdict(item['title'], sources=self.sources)
+        return [item]
+
+    def _screen(self, item):
+        entry = self.lt.screening_entry(item['title'], item['screening paperdict'])
+        return [item] if self.matcher.match(*entry.values()) else []
+
+    def _resolve(self, item):
+        if self.resolve_sources == self.sources:
+            paperdict = item['screening paperdict']
+        else:
+            paperdict = self.lt.paperdict(item['title'], sources=self.resolve_sources)
+        if paperdict is None:
+            return []
+        item['paperdict'] = paperdict
+        return [item]
+
+    def _download(self, item):
+        paperdict = item['paperdict']
+        if paperdict.get('url') is None:
+            item['download'] = {'file': paperdict['ID'] + '.pdf', 'url': None, 'status': 'no url', 'bytes': 0, 'error': None, 'seconds': 0.}
+        else:
+            item['download'] = self._downloader.submit(paperdict['url'], paperdict['ID'] + '.pdf').result()
+            self.lt.record_download(item['download'])
+        return [item]
+
+    def _feed(self, titles, outbox):
+        # Deduplicates titles on the fly (first occurrence kept), in batches for the arXiv prefetch
+        seen = set()
+        batch = []
+        try:
+            for title in titles:
+                key = title_key(title)
+                if key in seen:
+                    continue
+                seen.add(key)
+                batch.append((self.fed, title))
+                self.fed += 1
+                if len(batch) >= self.arxiv_batch_size:
+                    outbox.put(batch)
+                    batch = []
+            if len(batch) > 0:
+                outbox.put(batch)
+        except Exception as exc:
+            self.feed_error = exc  # raised by stream once the titles already fed are through
+        finally:
+            outbox.put(DONE)
+
+    def progress(self):
+        return {'fed': self.fed, **{stage.name: stage.progress() for stage in self.stages}}
+
+    def _monitor(self, stop):
+        while not stop.wait(self.progress_interval):
+            self.lt.say('Pipeline: ' + ', '.join(
+                f"{name} {stats['emitted']}/{stats['received']} (+{stats['queued']} queued)" if isinstance(stats, dict) else f'{name} {stats}'
+                for name, stats in self.progress().items()))
+
+    def stream(self, titles):
+        """Yields the items reaching the end of the pipeline as they come: dicts with the 'index' of
+        the title among the (deduplicated) input titles, the 'title', its 'paperdict' and, if
+        downloading, the 'download' report."""
+        stage_specs = [('prefetch', self._prefetch, 1), ('fetch', self._fetch, self.workers),
+                       ('screen', self._screen, 1), ('resolve', self._resolve, self.workers)]
+        if self.folder is not None:
+            self._downloader = self.lt.downloader(self.folder, self.download_workers)
+            stage_specs.append(('download', self._download, self.download_workers))
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(stage_specs) + 1)]
+        self.stages = [Stage(name, func, workers, queues[i], queues[i + 1], say=self.lt.say)
+                       for i, (name, func, workers) in enumerate(stage_specs)]
+        for stage in self.stages:
+            stage.start()
+        feeder = threading.Thread(target=self._feed, args=(titles, queues[0]), daemon=True)
+        feeder.start()
+        stop = threading.Event()
+        threading.Thread(target=self._monitor, args=(stop,), daemon=True).start()
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is DONE:
+                    break
+                yield item
+            if self.feed_error is not None:
+                raise self.feed_error
+        finally:
+            stop.set()
+            if self.folder is not None:
+                self._downloader.close()
+            self.lt.release_arxiv(self._prefetched)
+            self._prefetched = []
+
+    def run(self, titles, sort_by_year=True):
+        """Runs the whole pipeline; returns the paperdicts (and the download reports if folder is given),
+        in the order of the batch path."""
+        start = time.monotonic()
+        items = sorted(self.stream(titles), key=(lambda item: item['index']))
+        if sort_by_year:
+            items = sorted(items, key=(lambda item: item['paperdict'].get('year', '9999')))
+        paperdicts = [item['paperdict'] for item in items]
+        self.lt.end_run('pipeline', start, len(paperdicts))
+        if self.folder is not None:
+            return paperdicts, [item['download'] for item in items]
+        return paperdicts
@@ -0,0 +1,171 @@
+import email.utils
+import logging
+import random
+import threading
+import time
+
+import utils
+
+
+logger = logging.getLogger('litrevtools.retry')
+
+TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# Matched against the names in an exception's MRO, so that backends need not be imported here
+PERMANENT_EXCEPTION_NAMES = {
+    'PermissionError', 'FileNotFoundError',
+    'InvalidJSONError', 'JSONDecodeError', 'InvalidURL', 'MissingSchema', 'InvalidSchema', 'URLRequired',
+    'InvalidHeader', 'TooManyRedirects', 'ContentDecodingError',
+}
+TRANSIENT_EXCEPTION_NAMES = {
+    'TransportError', 'TimeoutException', 'ArxivError', 'MaxTriesExceededException',
+    'DOSException', 'RemoteDisconnected', 'IncompleteRead', 'HTTPException',
+    'ConnectionError', 'Timeout', 'ChunkedEncodingError',  # requests, connection level
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised without issuing a request when the circuit breaker of its host is open."""
+
+
+def status_of(exc):
+    for value in (getattr(exc, 'status', None), getattr(exc, 'code', None),
+                  getattr(getattr(exc, 'response', None), 'status_code', None)):
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def retry_after(exc):
+    # Seconds requested by a Retry-After header, if the exception carries one
+    headers = getattr(exc, 'headers', None)
+    if headers is None:
+        headers = getattr(getattr(exc, 'response', None), 'headers', None)
+    value = headers.get('Retry-After') if headers is not None else None
+    if value is None:
+        return None
+    try:
+        return max(0., float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0., email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_transient(exc):
+    status = status_of(exc)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    if names & PERMANENT_EXCEPTION_NAMES:
+        return False
+    if names & TRANSIENT_EXCEPTION_NAMES:
+        return True
+    # Socket-level errors; the exceptions of requests also subclass OSError, but only the ones above are transient
+    return isinstance(exc, OSError) and 'RequestException' not in names
+
+
+class CircuitBreaker():
+    """Opens after `failure_threshold` consecutive failed calls (calls that ran out of retries),
+    then lets a single trial request through every `reset_timeout` seconds until one succeeds."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=600.):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.reset_timeout else 'open'
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.opened_at = time.monotonic()  # one trial request per reset_timeout
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class RetryPolicy():
+    """Retries transient errors with exponential backoff and jitter, honouring Retry-After.
+
+    Permanent errors (4xx other than 408/425/429, parsing bugs...) are raised at once.
+    Each host has its own circuit breaker, so that a dead backend is skipped instead of
+    being retried title after title. Every retry is logged and passed to the callables of
+    `on_retry`, as `callback(host, exc, wait)`.
+    """
+
+    def __init__(self, max_trials=8, base_wait=2., max_wait=120., max_retry_after=600., failure_threshold=5, reset_timeout=600., on_retry=None):
+        self.max_trials = max_trials
+        self.base_wait = base_wait
+        self.max_wait = max_wait
+        self.max_retry_after = max_retry_after
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {}
+        self.retries = {}
+        self.on_retry = list(on_retry) if on_retry is not None else []
+        self._lock = threading.Lock()
+
+    def breaker(self, host):
+        with self._lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self.breakers[host]
+
+    def backoff(self, trial):
+        wait = min(self.max_wait, self.base_wait * 2 ** trial)
+        return wait / 2 + random.uniform(0, wait / 2)
+
+    def call(self, func, *args, host=None, **kwargs):
+        breaker = self.breaker(host)
+        trial = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit breaker open for '{host}', skipping request")
+            try:
+                result = func(*args, **kwargs)
+            except (KeyboardInterrupt, utils.Cancelled):
+                raise
+            except Exception as exc:
+                if not is_transient(exc):
+                    breaker.record_success()  # the host answered
+                    raise
+                trial += 1
+                if trial >= self.max_trials:
+                    # One failure per call, so that a single flaky request cannot open the breaker of its host
+                    if status_of(exc) != 429:  # throttling means the host is alive
+                        breaker.record_failure()
+                    raise
+                wait = self.backoff(trial - 1)
+                requested_wait = retry_after(exc)
+                if requested_wait is not None:
+                    wait = max(wait, min(requested_wait, self.max_retry_after))
+                with self._lock:
+                    self.retries[host] = self.retries.get(host, 0) + 1
+                logger.info(f"Transient error from '{host}' ({type(exc).__name__}: {exc}), retrying in {wait:.1f}s")
+                for callback in self.on_retry:
+                    callback(host, exc, wait)
+                time.sleep(wait)
+            else:
+                breaker.record_success()
+                return result
@@ -0,0 +1,278 @@
+"""Sharded runs: each shard of a title list runs independently (one machine, container or process per shard)
+into its own store, then the stores are merged.
+
+    python shard.py run STORE --shard 0 --shards 4 --titles titles.txt [--tasks paperdicts citation_counts download]
+    python shard.py crawl STORE --shard 0 --shards 4 (--titles titles.txt | --round-graph MERGED/graph.json) [--keywords ...] [--depth 2]
+    python shard.py merge OUT STORE [STORE ...]
+    python shard.py select MERGED --titles titles.txt [--keywords ...] [--depth 2]
+
+A title belongs to shard `title_shard(title, n_shards)`, a hash of its title key, so that every
+machine computes the same split from the same list. A bulldozer crawl runs in rounds: a first
+round resolves the seeds of each shard, then each round expands the frontier papers of each
+shard by one hop from the merged graph of the previous round, until the merged frontier is
+empty; `select` then picks the collected titles matching the keywords.
+"""
+import argparse
+import ast
+import json
+import os
+import shutil
+import time
+
+from bibstream import BibWriter, iter_entries
+from downloader import MANIFEST_NAME
+from litrevtools import LitrevTools, ARXIV_API_URL, S2_API_URL
+from snowball import CitationGraph
+from titles import TitleIndex, get_title, title_key, title_shard
+from utils import save_json
+
+
+TASKS = ('paperdicts', 'citation_counts', 'download')
+
+# Files of a store, for one shard or merged
+META_NAME = 'shard.json'
+PAPERDICTS_NAME = 'paperdicts.bib'
+CITATION_COUNTS_NAME = 'citation_counts.json'
+PDFS_NAME = 'pdfs'
+GRAPH_NAME = 'graph.json'
+
+
+def shard_titles(titles, shard, n_shards):
+    return [title for title in titles if title_shard(get_title(title), n_shards) == shard]
+
+
+def _load_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r') as json_file:
+        return json.load(json_file)
+
+
+def _update_meta(store, shard, n_shards, task, **fields):
+    path = os.path.join(store, META_NAME)
+    meta = _load_json(path, {'shard': shard, 'n_shards': n_shards, 'tasks': {}})
+    if (meta['shard'], meta['n_shards']) != (shard, n_shards):
+        raise ValueError(f"{store} holds shard {meta['shard']} of {meta['n_shards']}, not {shard} of {n_shards}")
+    meta['tasks'][task] = dict(fields, completed=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    save_json(path, meta, indent=1)
+
+
+def run_shard(lt, titles, store, shard, n_shards, tasks=TASKS, sources=None, workers=None, download_workers=8):
+    """Runs tasks on the titles of shard (out of n_shards) into the folder store. Each task resumes
+    from what store already holds: paperdicts are appended to a .bib file skipping known IDs and
+    complete PDFs are skipped."""
+    store = os.path.expanduser(store)
+    os.makedirs(store, exist_ok=True)
+    titles = shard_titles(titles, shard, n_shards)
+    lt.say(f'Shard {shard} of {n_shards}: {len(titles)} titles')
+    bib_path = os.path.join(store, PAPERDICTS_NAME)
+    paperdict_kwargs = {'sources': sources} if sources is not None else {}
+
+    if 'paperdicts' in tasks or 'download' in tasks:
+        lt.write_bibtexs(titles, bib_path, workers=workers, **paperdict_kwargs)
+        _update_meta(store, shard, n_shards, 'paperdicts', titles=len(titles))
+
+    if 'citation_counts' in tasks:
+        counts = lt.citation_counts(titles, workers=workers)
+        save_json(os.path.join(store, CITATION_COUNTS_NAME), counts, indent=1)
+        _update_meta(store, shard, n_shards, 'citation_counts', titles=len(titles))
+
+    if 'download' in tasks:
+        start = time.monotonic()
+        folder = os.path.join(store, PDFS_NAME)
+        os.makedirs(folder, exist_ok=True)
+        downloader = lt.downloader(folder, download_workers)
+        try:
+            futures = [downloader.submit(paperdict['url'], paperdict['ID'] + '.pdf')
+                       for paperdict in lt.read_bibtexs(bib_path) if paperdict.get('url') is not None]
+            reports = [future.result() for future in futures]
+        finally:
+            downloader.close()
+        for report in reports:
+            lt.record_download(report)
+        lt.end_run('download', start, len(reports))
+        _update_meta(store, shard, n_shards, 'download', files=len(reports),
+                     failed=sum(report['status'] == 'failed' for report in reports))
+
+
+def crawl_shard(lt, store, shard, n_shards, titles=None, round_graph=None, keywords=None, depth=1, max_frontier=None, workers=None):
+    """One round of a sharded bulldozer crawl into store: resolves the seeds of shard among titles
+    (first round, round_graph None), or expands by one hop the frontier papers of shard in the merged
+    graph of the previous round. max_frontier applies to each shard. Returns the graph of the shard."""
+    store = os.path.expanduser(store)
+    os.makedirs(store, exist_ok=True)
+    graph_path = os.path.join(store, GRAPH_NAME)
+    if round_graph is None:
+        lt.bulldozer(shard_titles(titles, shard, n_shards), keywords=keywords, depth=depth, workers=workers, checkpoint=graph_path, hops=0)
+    else:
+        shutil.copyfile(os.path.expanduser(round_graph), graph_path)  # a round that failed restarts from the merged graph
+        lt.bulldozer([], keywords=keywords, depth=depth, max_frontier=max_frontier, workers=workers, checkpoint=graph_path,
+                     shard=(shard, n_shards))
+    _update_meta(store, shard, n_shards, 'crawl', nodes=len(lt.graph.nodes), frontier=len(lt.graph.frontier))
+    return lt.graph
+
+
+def select(lt, store, titles, keywords=None, depth=1):
+    """Titles collected by a finished sharded crawl, merged into store: the result of
+    lt.bulldozer(titles, keywords=keywords, depth=depth) run in a single process."""
+    graph_path = os.path.join(os.path.expanduser(store), GRAPH_NAME)
+    if len(CitationGraph.load(graph_path).frontier) > 0:
+        raise ValueError(f'The crawl merged into {store} is not finished: run another round from {graph_path}')
+    return lt.bulldozer(titles, keywords=keywords, depth=depth, checkpoint=graph_path)
+
+
+def _link_or_copy(source, destination):
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def merge(stores, out):
+    """Merges the stores of the shards of a run into the folder out, deduplicating paperdicts (by
+    title key, then ID), citation counts (by title key, a count beating a missing one) and PDFs (by
+    file name; a file whose checksum differs from the one already merged is reported, not merged).
+    Returns a summary of the merge."""
+    stores = [os.path.expanduser(store) for store in stores]
+    out = os.path.expanduser(out)
+    metas = [_load_json(os.path.join(store, META_NAME)) for store in stores]
+    for store, meta in zip(stores, metas):
+        if meta is None:
+            raise ValueError(f'{store} is not a shard store (no {META_NAME})')
+    n_shards = {meta['n_shards'] for meta in metas}
+    if len(n_shards) != 1:
+        raise ValueError(f'Stores of runs with different numbers of shards: {sorted(n_shards)}')
+    n_shards = n_shards.pop()
+    shards = [meta['shard'] for meta in metas]
+    if len(set(shards)) != len(shards):
+        raise ValueError(f'Several stores for the same shard: {sorted(shards)}')
+    os.makedirs(out, exist_ok=True)
+    summary = {'shards': sorted(shards), 'missing shards': sorted(set(range(n_shards)) - set(shards))}
+
+    paperdicts = TitleIndex()
+    n_read = 0
+    for store in stores:
+        bib_path = os.path.join(store, PAPERDICTS_NAME)
+        if os.path.exists(bib_path):
+            for paperdict in iter_entries(bib_path):
+                n_read += 1
+                paperdicts.add(paperdict)
+    tmp_path = os.path.join(out, PAPERDICTS_NAME + '.tmp')
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    with BibWriter(tmp_path, fsync=False) as writer:
+        written = writer.write_many(sorted(paperdicts, key=(lambda d: d.get('year', '9999'))))
+    os.replace(tmp_path, os.path.join(out, PAPERDICTS_NAME))
+    summary['paperdicts'] = sum(written)
+    summary['duplicate paperdicts'] = n_read - sum(written)
+
+    merged_counts = {}  # title key -> (title, citation count, daily citation count)
+    for store in stores:
+        store_counts = _load_json(os.path.join(store, CITATION_COUNTS_NAME))
+        if store_counts is None:
+            continue
+        for title, count in store_counts['citation counts'].items():
+            key = title_key(title)
+            if key not in merged_counts or (merged_counts[key][1] is None and count is not None):
+                merged_counts[key] = (title, count, store_counts['daily citation counts'][title])
+    counts = {'citation counts': {title: count for title, count, _ in merged_counts.values()},
+              'daily citation counts': {title: daily_count for title, _, daily_count in merged_counts.values()}}
+    save_json(os.path.join(out, CITATION_COUNTS_NAME), counts, indent=1)
+    summary['citation counts'] = len(counts['citation counts'])
+
+    manifest = {}
+    duplicates = 0
+    conflicts = []
+    out_folder = os.path.join(out, PDFS_NAME)
+    for store in stores:
+        folder = os.path.join(store, PDFS_NAME)
+        for filename, record in _load_json(os.path.join(folder, MANIFEST_NAME), {}).items():
+            if not os.path.exists(os.path.join(folder, filename)):
+                continue
+            if filename in manifest:
+                if manifest[filename]['sha256'] == record['sha256']:
+                    duplicates += 1
+                else:
+                    conflicts.append(os.path.join(folder, filename))
+                continue
+            os.makedirs(out_folder, exist_ok=True)
+            _link_or_copy(os.path.join(folder, filename), os.path.join(out_folder, filename))
+            manifest[filename] = record
+    if len(manifest) > 0:
+        save_json(os.path.join(out_folder, MANIFEST_NAME), manifest, indent=1)
+    summary.update({'pdfs': len(manifest), 'duplicate pdfs': duplicates, 'conflicting pdfs': conflicts})
+
+    graph_paths = [os.path.join(store, GRAPH_NAME) for store in stores if os.path.exists(os.path.join(store, GRAPH_NAME))]
+    if len(graph_paths) > 0:
+        graph = CitationGraph.merge([CitationGraph.load(path) for path in graph_paths])
+        graph.save(os.path.join(out, GRAPH_NAME))
+        summary.update({'graph nodes': len(graph.nodes), 'frontier': len(graph.frontier)})
+
+    save_json(os.path.join(out, META_NAME), {'merged': shards, 'n_shards': n_shards, 'summary': summary,
+                                              'completed': time.strftime('%Y-%m-%dT%H:%M:%S')}, indent=1)
+    return summary
+
+
+def _read_titles(path):
+    with open(os.path.expanduser(path), 'r', encoding='utf-8') as titles_file:
+        return [line.strip() for line in titles_file if line.strip() != '']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='run the tasks of one shard')
+    crawl_parser = subparsers.add_parser('crawl', help='run one round of a sharded bulldozer crawl')
+    merge_parser = subparsers.add_parser('merge', help='merge the stores of the shards')
+    select_parser = subparsers.add_parser('select', help='print the titles collected by a merged, finished crawl')
+    for subparser in (run_parser, crawl_parser):
+        subparser.add_argument('store')
+        subparser.add_argument('--shard', type=int, required=True)
+        subparser.add_argument('--shards', type=int, required=True)
+    select_parser.add_argument('store')
+    for subparser in (run_parser, crawl_parser, select_parser):
+        subparser.add_argument('--titles', default=None, help='file with one title per line')
+        subparser.add_argument('--workers', type=int, default=1)
+        subparser.add_argument('--cache', default=None, help='SQLite cache file')
+        subparser.add_argument('--arxiv-api-url', default=ARXIV_API_URL)
+        subparser.add_argument('--s2-api-url', default=S2_API_URL)
+        subparser.add_argument('--no-rate-limits', action='store_true', help='e.g. against local mock servers')
+        subparser.add_argument('--quiet', action='store_true')
+    run_parser.add_argument('--tasks', nargs='+', choices=TASKS, default=list(TASKS))
+    run_parser.add_argument('--sources', nargs='+', default=None)
+    run_parser.add_argument('--download-workers', type=int, default=8)
+    for subparser in (crawl_parser, select_parser):
+        subparser.add_argument('--keywords', default='None', help="Python literal, e.g. \"['causal', ('diffusion', '~graph')]\"")
+        subparser.add_argument('--depth', type=int, default=1)
+    crawl_parser.add_argument('--round-graph', default=None, help='merged graph of the previous round (none on the first round)')
+    crawl_parser.add_argument('--max-frontier', type=int, default=None)
+    merge_parser.add_argument('out')
+    merge_parser.add_argument('stores', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'merge':
+        print(json.dumps(merge(args.stores, args.out), indent=1))
+        return
+
+    lt = LitrevTools(workers=args.workers, cache=args.cache, arxiv_api_url=args.arxiv_api_url, s2_api_url=args.s2_api_url,
+                     rate_limits={source: 0. for source in ['arxiv', 'semanticscholar', 'googlescholar', 'google']} if args.no_rate_limits else None,
+                     verbose=not args.quiet)
+    titles = _read_titles(args.titles) if args.titles is not None else None
+    if args.command == 'run':
+        run_shard(lt, titles, args.store, args.shard, args.shards, tasks=args.tasks, sources=args.sources,
+                  download_workers=args.download_workers)
+    elif args.command == 'crawl':
+        if titles is None and args.round_graph is None:
+            parser.error('crawl needs --titles (first round) or --round-graph')
+        graph = crawl_shard(lt, args.store, args.shard, args.shards, titles=titles, round_graph=args.round_graph,
+                            keywords=ast.literal_eval(args.keywords), depth=args.depth, max_frontier=args.max_frontier)
+        print(f'{len(graph.nodes)} papers, {len(graph.frontier)} in the frontier')
+    else:
+        for title in select(lt, args.store, titles, keywords=ast.literal_eval(args.keywords), depth=args.depth):
+            print(title)
+
+
+if __name__ == '__main__':
+    main()
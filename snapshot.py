@@ -0,0 +1,355 @@
+"""Offline arXiv corpus built from the public arXiv metadata snapshot (JSON lines, one record per paper).
+
+    python snapshot.py build arxiv-metadata-oai-snapshot.json FOLDER [--cats cs.LG stat.ML]
+    python snapshot.py search FOLDER [--keywords "['causal', ('diffusion', '~graph')]"] [--cats cs.LG stat.ML]
+
+The store is a folder of flat files, memory-mapped when opened: the records, an inverted index
+of the words of titles and abstracts, an index of categories and a sorted table of title hashes.
+"""
+import argparse
+import ast
+from array import array
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from keywords import KeywordMatcher
+from titles import title_key
+
+
+FORMAT_VERSION = 1
+CHUNK_SIZE = 100000  # records tokenized between two flushes of postings while building
+SCAN_CHUNK_SIZE = 50000  # records per task of the multi-process scans
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def title_hash(title):
+    return int.from_bytes(hashlib.blake2b(title_key(title).encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _record_from_snapshot(raw):
+    # Compact record kept in the store, from a record of the arXiv metadata snapshot
+    authors = [' '.join(part for part in (first, last, suffix) if part) for last, first, suffix, *_ in raw.get('authors_parsed') or []]
+    versions = raw.get('versions') or []
+    return {
+        'id': raw['id'],
+        'title': ' '.join(raw['title'].split()),
+        'abstract': ' '.join((raw.get('abstract') or '').split()),
+        'authors': authors,
+        'categories': (raw.get('categories') or '').split(),
+        'doi': raw.get('doi'),
+        'update_date': raw.get('update_date'),
+        'version': versions[-1]['version'] if len(versions) > 0 else '',
+        # Year of the latest version, as in the bibtex of arxiv.org
+        'year': int(versions[-1]['created'].split()[3]) if len(versions) > 0 else int(raw['update_date'][:4]),
+    }
+
+
+class _PostingsWriter():
+    # Postings lists (sorted doc ids per term) built chunk by chunk: doc ids only grow, so each chunk is
+    # sorted by term and appended to a per-chunk run; `finish` lays the runs out term by term.
+
+    def __init__(self, path):
+        self.path = path
+        self.terms = {}
+        self.runs = []
+        self._term_ids = []
+        self._doc_ids = []
+
+    def add(self, doc_id, terms):
+        for term in terms:
+            term_id = self.terms.get(term)
+            if term_id is None:
+                term_id = self.terms[term] = len(self.terms)
+            self._term_ids.append(term_id)
+            self._doc_ids.append(doc_id)
+
+    def flush(self):
+        if len(self._term_ids) == 0:
+            return
+        term_ids = np.array(self._term_ids, dtype=np.uint32)
+        doc_ids = np.array(self._doc_ids, dtype=np.uint32)
+        order = np.argsort(term_ids, kind='stable')
+        run_path = f'{self.path}.run{len(self.runs)}.npz'
+        np.savez(run_path, term_ids=term_ids[order], doc_ids=doc_ids[order])
+        self.runs.append(run_path)
+        self._term_ids, self._doc_ids = [], []
+
+    def finish(self):
+        self.flush()
+        n_terms = len(self.terms)
+        counts = np.zeros(n_terms, dtype=np.uint64)
+        for run_path in self.runs:
+            with np.load(run_path) as run:
+                counts += np.bincount(run['term_ids'], minlength=n_terms).astype(np.uint64)
+        offsets = np.zeros(n_terms + 1, dtype=np.uint64)
+        np.cumsum(counts, out=offsets[1:])
+        postings = np.lib.format.open_memmap(self.path + '.postings.npy', mode='w+', dtype=np.uint32, shape=(int(offsets[-1]),))
+        filled = offsets[:-1].copy()
+        for run_path in self.runs:
+            with np.load(run_path) as run:
+                term_ids, doc_ids = run['term_ids'], run['doc_ids']
+            run_counts = np.bincount(term_ids, minlength=n_terms).astype(np.uint64)
+            run_starts = np.zeros(n_terms, dtype=np.uint64)
+            np.cumsum(run_counts[:-1], out=run_starts[1:])
+            rank = np.arange(len(term_ids), dtype=np.uint64) - run_starts[term_ids]
+            postings[filled[term_ids] + rank] = doc_ids
+            filled += run_counts
+            os.remove(run_path)
+        postings.flush()
+        np.save(self.path + '.offsets.npy', offsets)
+        with open(self.path + '.terms.txt', 'w', encoding='utf-8') as terms_file:
+            terms_file.write('\n'.join(self.terms))  # in term id order
+
+
+class _Postings():
+
+    def __init__(self, path):
+        self.postings = np.load(path + '.postings.npy', mmap_mode='r')
+        self.offsets = np.load(path + '.offsets.npy', mmap_mode='r')
+        with open(path + '.terms.txt', 'r', encoding='utf-8') as terms_file:
+            content = terms_file.read()
+        self.terms = content.split('\n') if content != '' else []
+        self._term_ids = None
+        self._joined = None
+        self._matching = {}
+
+    def term_id(self, term):
+        if self._term_ids is None:
+            self._term_ids = {term: term_id for term_id, term in enumerate(self.terms)}
+        return self._term_ids.get(term)
+
+    def matching_terms(self, part, starts=False, ends=False):
+        # Ids of the terms containing part (starting with it if starts, ending with it if ends), cached. Found
+        # with str.find in the terms joined by newlines, one search per matching term instead of a test per term.
+        key = (part, starts, ends)
+        if starts and ends:
+            return [term_id for term_id in [self.term_id(part)] if term_id is not None]
+        if key not in self._matching:
+            if self._joined is None:
+                self._joined = '\n' + '\n'.join(self.terms) + '\n'
+                lengths = np.fromiter(map(len, self.terms), dtype=np.int64, count=len(self.terms))
+                self._starts = np.cumsum(lengths + 1) - lengths  # position of each term in _joined
+            pattern = ('\n' if starts else '') + part + ('\n' if ends else '')
+            term_ids = []
+            position = self._joined.find(pattern)
+            while position >= 0:
+                term_id = int(np.searchsorted(self._starts, position + starts, side='right')) - 1
+                term_ids.append(term_id)
+                position = self._joined.find(pattern, int(self._starts[term_id]) + len(self.terms[term_id]))
+            self._matching[key] = term_ids
+        return self._matching[key]
+
+    def docs(self, term_ids, n_docs):
+        # Boolean mask of the docs with one of term_ids
+        mask = np.zeros(n_docs, dtype=bool)
+        for term_id in term_ids:
+            mask[self.postings[self.offsets[term_id]:self.offsets[term_id + 1]]] = True
+        return mask
+
+
+def _open_records(folder):
+    return np.load(os.path.join(folder, 'records.offsets.npy'), mmap_mode='r'), np.memmap(os.path.join(folder, 'records.bin'), dtype=np.uint8, mode='r')
+
+
+def _scan(folder, leaves, doc_ids):
+    # Docs of doc_ids matching each leaf keyword, by substring search in their lowercased title and abstract
+    offsets, data = _open_records(folder)
+    found = [[] for _ in leaves]
+    for doc_id in doc_ids:
+        record = json.loads(bytes(data[offsets[doc_id]:offsets[doc_id + 1]]))
+        text = record['title'].lower() + '\x00' + record['abstract'].lower()
+        for i, leaf in enumerate(leaves):
+            if leaf in text:
+                found[i].append(doc_id)
+    return [np.array(ids, dtype=np.uint32) for ids in found]
+
+
+class ArxivSnapshot():
+    """Memory-mapped store of arXiv records with an inverted index over titles and abstracts.
+
+    Keyword expressions follow the rules of KeywordMatcher, evaluated on (title, abstract).
+    Keywords made of letters and digits only are answered from the index alone; other keywords
+    are narrowed down with the index, then checked on the remaining records; keywords the index
+    cannot narrow down (no letters or digits) are checked on every record. Scans of more than
+    SCAN_CHUNK_SIZE records run on `processes` processes.
+    """
+
+    def __init__(self, folder, processes=None):
+        self.folder = os.path.expanduser(folder)
+        with open(os.path.join(self.folder, 'meta.json'), 'r') as meta_file:
+            self.meta = json.load(meta_file)
+        if self.meta['format'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {self.meta['format']} in {self.folder}, rebuild it")
+        self.processes = processes if processes is not None else os.cpu_count()
+        self._offsets, self._data = _open_records(self.folder)
+        self.words = _Postings(os.path.join(self.folder, 'words'))
+        self.categories = _Postings(os.path.join(self.folder, 'categories'))
+        titles = np.load(os.path.join(self.folder, 'titles.npy'), mmap_mode='r')
+        self._title_hashes, self._title_docs = titles[0], titles[1]
+
+    def __len__(self):
+        return self.meta['count']
+
+    def record(self, doc_id):
+        return json.loads(bytes(self._data[self._offsets[doc_id]:self._offsets[doc_id + 1]]))
+
+    def records(self, doc_ids):
+        return [self.record(doc_id) for doc_id in doc_ids]
+
+    def find_title(self, title):
+        """Record whose title has the same title key as title, or None."""
+        hash_value = np.uint64(title_hash(title))
+        i = int(np.searchsorted(self._title_hashes, hash_value))
+        while i < len(self._title_hashes) and self._title_hashes[i] == hash_value:
+            record = self.record(int(self._title_docs[i]))
+            if title_key(record['title']) == title_key(title):
+                return record
+            i += 1
+        return None
+
+    def _leaf_candidates(self, leaf):
+        # (mask of the docs that may contain leaf, whether they all do), from the index alone
+        n_docs = len(self)
+        parts = [(match.group(), match.start() > 0, match.end() < len(leaf)) for match in TOKEN_PATTERN.finditer(leaf)]
+        if len(parts) == 0:
+            return np.ones(n_docs, dtype=bool), False
+        candidates = None
+        for part, left_bounded, right_bounded in parts:
+            # Words the part of the keyword can be found in, given what surrounds it in the keyword
+            term_ids = self.words.matching_terms(part, starts=left_bounded, ends=right_bounded)
+            mask = self.words.docs(term_ids, n_docs)
+            candidates = mask if candidates is None else candidates & mask
+        # A word (or part of one) is found exactly when the index says so
+        return candidates, len(parts) == 1 and parts[0][0] == leaf
+
+    def _leaf_masks(self, leaves):
+        # {leaf: mask of the docs containing it}; the leaves the index cannot answer alone share one scan
+        n_docs = len(self)
+        masks = {}
+        to_scan = {}
+        for leaf in leaves:
+            candidates, exact = self._leaf_candidates(leaf)
+            if exact:
+                masks[leaf] = candidates
+            else:
+                to_scan[leaf] = candidates
+        if len(to_scan) > 0:
+            scanned = np.zeros(n_docs, dtype=bool)
+            for candidates in to_scan.values():
+                scanned |= candidates
+            found = self.scan(list(to_scan), np.flatnonzero(scanned).astype(np.uint32))
+            for (leaf, candidates), ids in zip(to_scan.items(), found):
+                mask = np.zeros(n_docs, dtype=bool)
+                mask[ids] = True
+                masks[leaf] = mask & candidates
+        return masks
+
+    def scan(self, leaves, doc_ids=None):
+        """For each leaf keyword, the ids among doc_ids (all by default) of the records containing it."""
+        doc_ids = np.arange(len(self), dtype=np.uint32) if doc_ids is None else np.asarray(doc_ids, dtype=np.uint32)
+        if len(doc_ids) <= SCAN_CHUNK_SIZE or self.processes <= 1:
+            return _scan(self.folder, leaves, doc_ids)
+        chunks = [doc_ids[i:i + SCAN_CHUNK_SIZE] for i in range(0, len(doc_ids), SCAN_CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=self.processes) as executor:
+            results = list(executor.map(_scan, [self.folder] * len(chunks), [leaves] * len(chunks), chunks))
+        return [np.concatenate([result[i] for result in results]) for i in range(len(leaves))]
+
+    def search(self, keywords=None, categories=None):
+        """Sorted ids of the records in one of categories (any category if None) matching keywords."""
+        n_docs = len(self)
+        if categories is not None:
+            term_ids = [self.categories.term_id(category) for category in categories]
+            selected = self.categories.docs([term_id for term_id in term_ids if term_id is not None], n_docs)
+        else:
+            selected = np.ones(n_docs, dtype=bool)
+        matcher = KeywordMatcher.compile(keywords)
+        if len(matcher.leaves) > 0:
+            selected &= matcher.combine(self._leaf_masks(matcher.leaves), np.ones(n_docs, dtype=bool))
+        elif matcher.match():
+            pass  # no keyword: everything matches
+        else:
+            selected[:] = False
+        return np.flatnonzero(selected)
+
+    @classmethod
+    def build(cls, snapshot_path, folder, categories=None, progress_every=100000):
+        """Ingests the arXiv metadata snapshot at snapshot_path into folder, keeping only the records
+        in one of categories if given. Streams the snapshot: memory holds the vocabulary, a chunk
+        of postings and 16 bytes per record (its offset and title hash)."""
+        folder = os.path.expanduser(folder)
+        os.makedirs(folder, exist_ok=True)
+        categories = set(categories) if categories is not None else None
+        words = _PostingsWriter(os.path.join(folder, 'words'))
+        categories_index = _PostingsWriter(os.path.join(folder, 'categories'))
+        offsets = array('Q', [0])
+        title_hashes = array('Q')
+        start = time.monotonic()
+        doc_id = 0
+        with open(os.path.expanduser(snapshot_path), 'r', encoding='utf-8') as snapshot_file, \
+                open(os.path.join(folder, 'records.bin'), 'wb') as records_file:
+            for line in snapshot_file:
+                if line.strip() == '':
+                    continue
+                record = _record_from_snapshot(json.loads(line))
+                if categories is not None and categories.isdisjoint(record['categories']):
+                    continue
+                content = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+                records_file.write(content)
+                offsets.append(offsets[-1] + len(content))
+                words.add(doc_id, set(TOKEN_PATTERN.findall(record['title'].lower() + '\x00' + record['abstract'].lower())))
+                categories_index.add(doc_id, record['categories'])
+                title_hashes.append(title_hash(record['title']))
+                doc_id += 1
+                if doc_id % CHUNK_SIZE == 0:
+                    words.flush()
+                    categories_index.flush()
+                if progress_every and doc_id % progress_every == 0:
+                    print(f'{doc_id} records ingested in {time.monotonic() - start:.0f}s')
+        words.finish()
+        categories_index.finish()
+        np.save(os.path.join(folder, 'records.offsets.npy'), np.frombuffer(offsets, dtype=np.uint64))
+        title_hashes = np.frombuffer(title_hashes, dtype=np.uint64)
+        order = np.argsort(title_hashes, kind='stable')
+        np.save(os.path.join(folder, 'titles.npy'), np.stack([title_hashes[order], order.astype(np.uint64)]))
+        with open(os.path.join(folder, 'meta.json'), 'w') as meta_file:
+            json.dump({'format': FORMAT_VERSION, 'count': doc_id, 'source': os.path.abspath(snapshot_path),
+                       'categories': sorted(categories) if categories is not None else None,
+                       'built': time.strftime('%Y-%m-%dT%H:%M:%S')}, meta_file)
+        return cls(folder)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='ingest a metadata snapshot')
+    build_parser.add_argument('snapshot')
+    build_parser.add_argument('folder')
+    build_parser.add_argument('--cats', nargs='+', default=None, help='only keep the records in one of these categories')
+    search_parser = subparsers.add_parser('search', help='print the ids and titles of the matching records')
+    search_parser.add_argument('folder')
+    search_parser.add_argument('--keywords', default='None', help="Python literal, e.g. \"['causal', ('diffusion', '~graph')]\"")
+    search_parser.add_argument('--cats', nargs='+', default=None)
+    search_parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        snapshot = ArxivSnapshot.build(args.snapshot, args.folder, categories=args.cats)
+        print(f'{len(snapshot)} records in {args.folder}')
+    else:
+        snapshot = ArxivSnapshot(args.folder, processes=args.processes)
+        start = time.monotonic()
+        doc_ids = snapshot.search(keywords=ast.literal_eval(args.keywords), categories=args.cats)
+        for record in snapshot.records(doc_ids):
+            print(f"{record['id']}  {record['title']}")
+        print(f'{len(doc_ids)} records in {1000 * (time.monotonic() - start):.0f} ms', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
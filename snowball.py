@@ -0,0 +1,78 @@
+import json
+
+import utils
+
+
+NODE_FIELDS = ('title', 'abstract', 'citationCount', 'publicationDate', 'year')
+
+
+class CitationGraph():
+    """Papers and citation edges collected while snowballing.
+
+    Nodes are stored as tuples of NODE_FIELDS keyed by paperId, edges as (citing, cited)
+    pairs. The frontier holds the (paperId, depth) pairs still to expand, so that a crawl
+    saved with `save` can be resumed with `load`.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.edges = set()
+        self.seeds = []
+        self.frontier = []
+        self.expanded = set()
+
+    @staticmethod
+    def node_id(pub):
+        # Papers unknown to Semantic Scholar have no paperId; they are kept, keyed by title, but never expanded
+        return pub['paperId'] if pub.get('paperId') is not None else 'title:' + (pub.get('title') or '')
+
+    def add_node(self, pub):
+        node_id = self.node_id(pub)
+        if node_id not in self.nodes:
+            self.nodes[node_id] = tuple(pub.get(field) for field in NODE_FIELDS)
+        return node_id
+
+    def add_edge(self, citing, cited):
+        self.edges.add((citing, cited))
+
+    def node(self, node_id):
+        return dict(zip(NODE_FIELDS, self.nodes[node_id]), paperId=None if node_id.startswith('title:') else node_id)
+
+    def records(self):
+        return [self.node(node_id) for node_id in self.nodes]
+
+    def save(self, path):
+        content = {
+            'nodes': self.nodes,
+            'edges': sorted(self.edges),
+            'seeds': self.seeds,
+            'frontier': self.frontier,
+            'expanded': sorted(self.expanded),
+        }
+        utils.save_json(path, content)
+
+    @classmethod
+    def merge(cls, graphs):
+        # Union of graphs crawled separately (e.g. by shards): the frontier keeps the papers no graph expanded
+        merged = cls()
+        for graph in graphs:
+            for node_id, node in graph.nodes.items():
+                merged.nodes.setdefault(node_id, node)
+            merged.edges |= graph.edges
+            merged.expanded |= graph.expanded
+            merged.seeds.extend(graph.seeds)
+        merged.seeds = list(dict.fromkeys(merged.seeds))
+        merged.frontier = list(dict.fromkeys(item for graph in graphs for item in graph.frontier if item[0] not in merged.expanded))
+        return merged
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as graph_file:
+            content = json.load(graph_file)
+        graph = cls()
+        graph.nodes = {node_id: tuple(node) for node_id, node in content['nodes'].items()}
+        graph.edges = {tuple(edge) for edge in content['edges']}
+        graph.seeds = content['seeds']
+        graph.frontier = [tuple(item) for item in content['frontier']]
+        graph.expanded = set(content['expanded'])
+        return graph
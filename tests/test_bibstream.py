@@ -0,0 +1,83 @@
+import logging
+import os
+
+import bibtexparser
+import pytest
+
+from bibstream import BibWriter, format_entry, iter_entries, scan_entries
+
+
+def entry(entry_id, title='A title', **fields):
+    return format_entry(dict({'ENTRYTYPE': 'misc', 'ID': entry_id, 'title': title, 'year': '2020'}, **fields))
+
+
+def write(path, text):
+    with open(path, 'w', encoding='utf-8') as bib_file:
+        bib_file.write(text)
+
+
+def read(path):
+    with open(path, 'r', encoding='utf-8') as bib_file:
+        return bib_file.read()
+
+
+def test_scan_entries_flags_trailing_fragment(tmp_path):
+    path = str(tmp_path / 'refs.bib')
+    write(path, entry('a') + entry('b') + entry('c')[:20])
+    assert [(entry_id, complete) for _, _, entry_id, complete in scan_entries(path)] == [('a', True), ('b', True), ('c', False)]
+
+
+def test_writer_truncates_trailing_fragment(tmp_path, caplog):
+    path = str(tmp_path / 'refs.bib')
+    complete = entry('a') + entry('b')
+    write(path, complete + entry('c')[:20])
+    with caplog.at_level(logging.WARNING, logger='litrevtools.bibstream'):
+        with BibWriter(path) as writer:
+            assert writer.ids == {'a', 'b'}
+            assert writer.write({'ENTRYTYPE': 'misc', 'ID': 'c', 'title': 'Rewritten', 'year': '2021'})
+    assert read(path + '.bak') == complete + entry('c')[:20]
+    assert read(path).startswith(complete)
+    assert [paperdict['ID'] for paperdict in iter_entries(path)] == ['a', 'b', 'c']
+    assert "'c'" in caplog.text
+
+
+def test_writer_keeps_unbalanced_entry_in_the_middle(tmp_path, caplog):
+    # An unbalanced entry swallows the entries after it when scanning: none of them may be removed
+    path = str(tmp_path / 'refs.bib')
+    text = entry('a') + entry('b').replace('A title}', 'A {title}') + entry('c') + entry('d')
+    write(path, text)
+    with caplog.at_level(logging.WARNING, logger='litrevtools.bibstream'):
+        with BibWriter(path) as writer:
+            assert writer.ids == {'a', 'b', 'c', 'd'}
+            assert not writer.write({'ENTRYTYPE': 'misc', 'ID': 'c', 'title': 'Duplicate', 'year': '2021'})
+    assert read(path) == text
+    assert not os.path.exists(path + '.bak')
+    assert 'unbalanced' in caplog.text
+
+
+def test_writer_skips_known_ids(tmp_path):
+    path = str(tmp_path / 'refs.bib')
+    with BibWriter(path, fsync=False) as writer:
+        assert writer.write_many([{'ENTRYTYPE': 'misc', 'ID': 'a', 'title': 'One'},
+                                  {'ENTRYTYPE': 'misc', 'ID': 'a', 'title': 'Two'}]) == [True, False]
+    with BibWriter(path, fsync=False) as writer:
+        assert 'a' in writer
+        assert not writer.write({'ENTRYTYPE': 'misc', 'ID': 'a', 'title': 'Three'})
+    assert [paperdict['title'] for paperdict in iter_entries(path)] == ['One']
+
+
+@pytest.mark.parametrize('batch_size', [1, 2, 200])
+def test_iter_entries_matches_bibtexparser(tmp_path, batch_size):
+    path = str(tmp_path / 'refs.bib')
+    text = (
+        '@string{jmlr = "Journal of Machine Learning Research"}\n\n'
+        + entry('a', title='Braces {inside} the {Title}', journal='jmlr')
+        + '@comment{not an entry}\n\n'
+        + '@article{b,\n  title = {Nested {braces} here},\n  journal = jmlr,\n  year = {2019}\n}\n\n'
+        + entry('c', title='Accents: Schr\\"odinger', abstract='Multi\nline abstract')
+        + '@misc{d, title = {One line}, year = {2018}}\n'
+    )
+    write(path, text)
+    expected = bibtexparser.loads(text).entries
+    assert list(iter_entries(path, batch_size=batch_size)) == expected
+    assert [paperdict['ID'] for paperdict in expected] == ['a', 'b', 'c', 'd']
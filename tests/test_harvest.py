@@ -0,0 +1,81 @@
+import itertools
+import os
+import sys
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from litrevtools import LitrevTools  # noqa: E402
+from mock_servers import CATEGORIES, START_DATE, MockServer, synthetic_corpus  # noqa: E402
+from retry import RetryPolicy  # noqa: E402
+
+PAGE_SIZE = 7
+
+
+@pytest.fixture
+def papers():
+    papers = synthetic_corpus(60)
+    # A run of entries updated within the same minute, longer than a page
+    for paper in papers[20:36]:
+        paper['updated'] = START_DATE + timedelta(minutes=200, seconds=paper['updated'].minute % 60)
+    papers.sort(key=lambda paper: paper['updated'])
+    return papers
+
+
+@pytest.fixture
+def server(papers):
+    with MockServer(papers) as server:
+        yield server
+
+
+def litrevtools(server, queries):
+    lt = LitrevTools(
+        arxiv_cats=CATEGORIES,
+        arxiv_max_results=PAGE_SIZE,
+        rate_limits={source: 0. for source in ['arxiv', 'semanticscholar', 'googlescholar', 'google']},
+        retry_policy=RetryPolicy(base_wait=0.001, max_wait=0.001),
+        arxiv_api_url=server.url + '/api/query',
+        s2_api_url=server.url,
+        verbose=False,
+    )
+    fetch = lt._fetch_arxiv_feed
+
+    def recording_fetch(url, offset=0):
+        queries.append(parse_qs(urlparse(url).query)['search_query'][0] + f" start={offset}")
+        return fetch(url, offset)
+    lt._fetch_arxiv_feed = recording_fetch
+    return lt
+
+
+def harvest_ids(entries):
+    return [entry.id.rsplit('/', 1)[-1][:-2] for entry in entries]
+
+
+def test_harvest_restarts_window_after_each_page(server, papers):
+    queries = []
+    lt = litrevtools(server, queries)
+    ids = harvest_ids(lt.harvest_arxiv(start='2024-01-01', end='2024-01-01'))
+    assert ids == [paper['arxivId'] for paper in papers]
+    assert len(queries) > len(papers) // PAGE_SIZE
+    # Offsets only grow while paging through the entries of a single minute
+    assert max(int(query.rsplit('start=', 1)[1]) for query in queries) < 16 + PAGE_SIZE
+    assert len({query.split(' start=')[0] for query in queries}) > 1
+
+
+def test_harvest_resumes_from_checkpoint(server, papers, tmp_path):
+    checkpoint = str(tmp_path / 'harvest.json')
+    expected = [paper['arxivId'] for paper in papers]
+    lt = litrevtools(server, [])
+    for stop in [3, 10, 25, 40]:
+        harvest = lt.harvest_arxiv(start='2024-01-01', end='2024-01-01', checkpoint=checkpoint)
+        first = harvest_ids(itertools.islice(harvest, stop))
+        harvest.close()
+        assert os.path.exists(checkpoint) == (stop >= PAGE_SIZE)
+        resumed = harvest_ids(lt.harvest_arxiv(start='2024-01-01', end='2024-01-01', checkpoint=checkpoint))
+        # Entries of the page being yielded when interrupted come again, nothing else does
+        assert first + [arxiv_id for arxiv_id in resumed if arxiv_id not in first] == expected
+        assert len(first) + len(resumed) - len(expected) < PAGE_SIZE
+        assert not os.path.exists(checkpoint)
@@ -0,0 +1,99 @@
+import json
+import socket
+import urllib.error
+
+import pytest
+import requests
+
+from retry import CircuitOpenError, RetryPolicy, is_transient, retry_after
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.headers = headers or {}
+
+
+class ArxivError(Exception):
+    pass
+
+
+def response_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(response=response)
+
+
+@pytest.mark.parametrize('exc', [
+    HTTPError(429), HTTPError(503), HTTPError(408), response_error(502),
+    urllib.error.HTTPError('http://example.org', 500, 'Internal Server Error', {}, None),
+    requests.ConnectionError(), requests.Timeout(), requests.exceptions.ChunkedEncodingError(),
+    socket.timeout(), ConnectionResetError(), ArxivError(),
+])
+def test_transient(exc):
+    assert is_transient(exc)
+
+
+@pytest.mark.parametrize('exc', [
+    HTTPError(400), HTTPError(404), response_error(403),
+    requests.exceptions.InvalidURL(), requests.exceptions.TooManyRedirects(), requests.RequestException(),
+    json.JSONDecodeError('Expecting value', '', 0), FileNotFoundError(), PermissionError(),
+    KeyError('title'), ValueError(),
+])
+def test_permanent(exc):
+    assert not is_transient(exc)
+
+
+def test_retry_after():
+    assert retry_after(HTTPError(429, {'Retry-After': '7'})) == 7.
+    assert retry_after(HTTPError(429, {'Retry-After': 'soon'})) is None
+    assert retry_after(HTTPError(429)) is None
+
+
+def failing(errors):
+    calls = []
+
+    def func():
+        calls.append(None)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return 'ok'
+    return func, calls
+
+
+def test_call_retries_transient_errors():
+    policy = RetryPolicy(base_wait=0.001, max_wait=0.001)
+    func, calls = failing([HTTPError(503), requests.ConnectionError()])
+    assert policy.call(func, host='example.org') == 'ok'
+    assert len(calls) == 3
+    assert policy.retries == {'example.org': 2}
+
+
+def test_call_raises_permanent_errors_at_once():
+    policy = RetryPolicy(base_wait=0.001, max_wait=0.001)
+    func, calls = failing([HTTPError(404)])
+    with pytest.raises(HTTPError):
+        policy.call(func, host='example.org')
+    assert len(calls) == 1
+
+
+def test_breaker_counts_calls_not_attempts():
+    policy = RetryPolicy(max_trials=3, base_wait=0.001, max_wait=0.001, failure_threshold=2)
+    func, calls = failing([HTTPError(503)] * 2)
+    assert policy.call(func, host='example.org') == 'ok'  # two failed attempts, but the call succeeded
+    assert policy.breaker('example.org').state == 'closed'
+    for _ in range(2):
+        with pytest.raises(HTTPError):
+            policy.call(failing([HTTPError(503)] * 3)[0], host='example.org')
+    assert policy.breaker('example.org').state == 'open'
+    with pytest.raises(CircuitOpenError):
+        policy.call(func, host='example.org')
+
+
+def test_throttling_does_not_open_breaker():
+    policy = RetryPolicy(max_trials=2, base_wait=0.001, max_wait=0.001, failure_threshold=1)
+    with pytest.raises(HTTPError):
+        policy.call(failing([HTTPError(429)] * 2)[0], host='example.org')
+    assert policy.breaker('example.org').state == 'closed'
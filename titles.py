@@ -0,0 +1,66 @@
+import hashlib
+import sys
+from functools import lru_cache
+
+
+@lru_cache(maxsize=2**20)
+def title_key(title):
+    # Key used to detect duplicate titles
+    return sys.intern(title.lower().strip(' .-'))
+
+
+@lru_cache(maxsize=2**20)
+def short_title_key(title):
+    # Initials of the words of the title, used to check that a found paper matches a requested title
+    words = ''.join(c if c.isalpha() else ' ' for c in title.lower()).split()
+    return sys.intern(''.join(word[0] for word in words))
+
+
+def title_shard(title, n_shards):
+    # Shard (0 to n_shards - 1) of a title, the same on every machine and Python process, unlike hash()
+    digest = hashlib.blake2b(title_key(title).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % n_shards
+
+
+def get_title(paper):
+    return paper if isinstance(paper, str) else paper['title']
+
+
+class TitleIndex():
+    """Maps title keys to the first paper (title string or paperdict) added under that key."""
+
+    def __init__(self, papers=(), key=title_key):
+        self.key = key
+        self._papers = {}
+        self.update(papers)
+
+    def add(self, paper):
+        # Returns True if no paper with the same title key was indexed yet
+        key = self.key(get_title(paper))
+        if key in self._papers:
+            return False
+        self._papers[key] = paper
+        return True
+
+    def update(self, papers):
+        for paper in papers:
+            self.add(paper)
+
+    def get(self, title, default=None):
+        return self._papers.get(self.key(title), default)
+
+    def __contains__(self, title):
+        return self.key(title) in self._papers
+
+    def __len__(self):
+        return len(self._papers)
+
+    def __iter__(self):
+        return iter(self._papers.values())
+
+    def keys(self):
+        return self._papers.keys()
+
+
+def unique_papers(papers, key=title_key):
+    return list(TitleIndex(papers, key=key))
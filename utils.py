@@ -1,8 +1,10 @@
+from contextlib import contextmanager
 from datetime import date, datetime, timedelta
-import traceback
+import json
+import os
 import time
-
-import sys
+import threading
+import importlib
 
 
 def clean_input(prompt):
@@ -22,29 +24,75 @@ def yes_or_no(question):
         return True
     return False
     
-def try_multiple_times(func, *args, trials=100, time_wait=10, **kwargs):
-    trials_here = trials
-    while trials_here > 0:
-        try:
+class Cancelled(Exception):
+    """Raised instead of issuing a request whose result is no longer needed."""
+
+
+@contextmanager
+def atomic_write(path, mode='w'):
+    """File object on a temporary file, moved onto path once the block completes, so that a crash
+    never leaves a truncated file behind."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, mode) as tmp_file:
+        yield tmp_file
+    os.replace(tmp_path, path)
+
+
+def save_json(path, content, indent=None):
+    with atomic_write(path) as json_file:
+        json.dump(content, json_file, indent=indent)
+
+
+class LazyModule():
+    """Stand-in for a module, imported on first attribute access.
+
+    If `attribute` is given, stands for that attribute of the module instead
+    (e.g. LazyModule('scholarly', 'scholarly') for `from scholarly import scholarly`).
+    """
+
+    def __init__(self, name, attribute=None):
+        self._name = name
+        self._attribute = attribute
+        self._target = None
+
+    def _load(self):
+        if self._target is None:
+            target = importlib.import_module(self._name)
+            self._target = getattr(target, self._attribute) if self._attribute is not None else target
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+class RateLimiter():
+    """Thread-safe limiter spacing calls by at least `min_interval` seconds."""
+
+    def __init__(self, min_interval=0.):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def limit(self, func):
+        def limited_func(*args, **kwargs):
+            self.wait()
             return func(*args, **kwargs)
-        except KeyboardInterrupt:
-            traceback.print_exc()
-            sys.exit()
-        except Exception:
-            trials_here -= 1
-            if trials_here == 0:
-                traceback.print_exc()
-                raise f'^ The function could not be made to work after {trials} trials, stopping here.'
-            else:
-                time.sleep(time_wait)
+        return limited_func
 
 # Function to calculate the number of days between a given date and today - authored by ChatGPT
-def days_between(given_date_str):
+def days_between(given_date_str, today=None):
     # Convert the given string date to a datetime object
     given_date = datetime.strptime(given_date_str, '%Y-%m-%d')
     
-    # Get today's date
-    today = datetime.today()
+    # Get today's date, unless a reference date is given
+    today = datetime.today() if today is None else today
     
     # Calculate the difference between today and the given date
     difference = today - given_date
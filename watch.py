@@ -0,0 +1,125 @@
+"""Incremental arXiv watch: harvests the entries updated since the previous run and keeps the new ones matching keywords.
+
+    python watch.py STATE STORE [--keywords "['causal', ('diffusion', '~graph')]"] [--cats cs.LG stat.ML] [--since 2024-01-01]
+
+STATE is a JSON file holding the last harvested update timestamp and the arXiv ids already
+screened; STORE is a .jsonl file (one record per paper) or a .bib file, appended to.
+"""
+import argparse
+import ast
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+
+import utils
+from bibstream import BibWriter
+from keywords import KeywordMatcher
+from litrevtools import LitrevTools, ARXIV_API_URL
+
+
+def arxiv_id_of(entry):
+    # 'http://arxiv.org/abs/2401.01234v2' -> '2401.01234'
+    return re.sub(r'v[0-9]+$', '', entry.id.split('/abs/')[-1])
+
+
+class ArxivWatch():
+    """Daily arXiv harvest that only fetches what changed since the previous run.
+
+    The state file records the categories watched, the latest `updated` timestamp harvested
+    and the ids of every entry already screened (matching or not). Each run restarts from the
+    day of that timestamp, so that a gap of any length costs one harvest of the delta, and
+    skips the entries already screened.
+    """
+
+    def __init__(self, lt, state_path, store_path):
+        self.lt = lt
+        self.state_path = os.path.expanduser(state_path)
+        self.store_path = os.path.expanduser(store_path)
+        self.state = {'cats': list(lt.arxiv_cats), 'updated': None, 'seen': []}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r') as state_file:
+                self.state = json.load(state_file)
+            if self.state['cats'] != list(lt.arxiv_cats):
+                lt.say(f"Watched categories changed from {self.state['cats']}: starting a new window")
+                self.state['cats'], self.state['updated'] = list(lt.arxiv_cats), None
+
+    def run(self, keywords=None, since=None):
+        """Screens the entries updated since the last run (or since the date `since`, or yesterday,
+        on the first run), appends the matching ones to the store and returns them."""
+        if self.state['updated'] is not None:
+            start = self.state['updated'][:10]
+        else:
+            start = since if since is not None else (date.today() - timedelta(1)).strftime('%Y-%m-%d')
+        end = date.today().strftime('%Y-%m-%d')
+        seen = set(self.state['seen'])
+        matcher = KeywordMatcher.compile(keywords)
+        matches = []
+        screened = 0
+        # The state is only saved once the run completes: an interrupted run is simply harvested again
+        for entry in self.lt.harvest_arxiv(start=start, end=end):
+            arxiv_id = arxiv_id_of(entry)
+            if self.state['updated'] is None or entry.updated > self.state['updated']:
+                self.state['updated'] = entry.updated
+            if arxiv_id in seen:
+                continue
+            seen.add(arxiv_id)
+            screened += 1
+            if matcher.match(entry.title, entry.summary):
+                matches.append(entry)
+        self._append(matches)
+        self.state['seen'] = sorted(seen)
+        utils.save_json(self.state_path, self.state)
+        self.lt.say(f'{screened} new entries screened since {start}, {len(matches)} matching, appended to {self.store_path}')
+        return matches
+
+    def _record(self, entry):
+        return {
+            'id': arxiv_id_of(entry),
+            'title': self.lt._clean_arxiv_title(entry.title),
+            'abstract': self.lt._format_abstract(entry.summary),
+            'authors': [author['name'] for author in entry.get('authors', [])],
+            'categories': [tag['term'] for tag in entry.get('tags', [])],
+            'published': entry.published,
+            'updated': entry.updated,
+            'url': f'https://arxiv.org/abs/{arxiv_id_of(entry)}',
+            'harvested': datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+
+    def _append(self, entries):
+        records = [self._record(entry) for entry in entries]
+        if self.store_path.endswith('.bib'):
+            with BibWriter(self.store_path) as writer:
+                for record, entry in zip(records, entries):
+                    primary_category = entry.get('arxiv_primary_category', {}).get('term', (record['categories'] or [''])[0])
+                    paperdict = self.lt._arxiv_paperdict(record['id'], record['title'], record['authors'],
+                                                         int(record['updated'][:4]), primary_category)
+                    paperdict['abstract'] = record['abstract']
+                    writer.write(self.lt._change_id(paperdict))
+        else:
+            with open(self.store_path, 'a') as store_file:
+                for record in records:
+                    store_file.write(json.dumps(record) + '\n')
+                store_file.flush()
+                os.fsync(store_file.fileno())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('state', help='JSON state file, created on the first run')
+    parser.add_argument('store', help='.jsonl or .bib file the matching entries are appended to')
+    parser.add_argument('--keywords', default='None', help="Python literal, e.g. \"['causal', ('diffusion', '~graph')]\"")
+    parser.add_argument('--cats', nargs='+', default=None, help='arXiv categories (LitrevTools defaults otherwise)')
+    parser.add_argument('--since', default=None, help='YYYY-MM-DD start of the first run (yesterday by default)')
+    parser.add_argument('--arxiv-api-url', default=ARXIV_API_URL)
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+
+    lt = LitrevTools(arxiv_cats=args.cats, arxiv_api_url=args.arxiv_api_url, verbose=not args.quiet)
+    watch = ArxivWatch(lt, args.state, args.store)
+    for entry in watch.run(keywords=ast.literal_eval(args.keywords), since=args.since):
+        print(f'{arxiv_id_of(entry)}  {lt._clean_arxiv_title(entry.title)}')
+
+
+if __name__ == '__main__':
+    main()